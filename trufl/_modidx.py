@@ -5,56 +5,138 @@ d = { 'settings': { 'branch': 'main',
                 'doc_host': 'https://franckalbinet.github.io',
                 'git_url': 'https://github.com/franckalbinet/trufl',
                 'lib_path': 'trufl'},
-  'syms': { 'trufl.callbacks': { 'trufl.callbacks.Callback': ('callbacks.html#callback', 'trufl/callbacks.py'),
+  'syms': { 'trufl.allocation': { 'trufl.allocation._water_fill': ('allocation.html#_water_fill', 'trufl/allocation.py'),
+                                  'trufl.allocation.allocate': ('allocation.html#allocate', 'trufl/allocation.py'),
+                                  'trufl.allocation.proportional_policy': ('allocation.html#proportional_policy', 'trufl/allocation.py'),
+                                  'trufl.allocation.quantiles_policy': ('allocation.html#quantiles_policy', 'trufl/allocation.py'),
+                                  'trufl.allocation.rank_to_sample': ('allocation.html#rank_to_sample', 'trufl/allocation.py'),
+                                  'trufl.allocation.softmax_policy': ('allocation.html#softmax_policy', 'trufl/allocation.py'),
+                                  'trufl.allocation.weighted_policy': ('allocation.html#weighted_policy', 'trufl/allocation.py')},
+            'trufl.benchmark': { 'trufl.benchmark._ranks': ('benchmark.html#_ranks', 'trufl/benchmark.py'),
+                                 'trufl.benchmark.compare': ('benchmark.html#compare', 'trufl/benchmark.py'),
+                                 'trufl.benchmark.import_time': ('benchmark.html#import_time', 'trufl/benchmark.py'),
+                                 'trufl.benchmark.main': ('benchmark.html#main', 'trufl/benchmark.py'),
+                                 'trufl.benchmark.run_benchmark': ('benchmark.html#run_benchmark', 'trufl/benchmark.py'),
+                                 'trufl.benchmark.synthetic_raster': ('benchmark.html#synthetic_raster', 'trufl/benchmark.py'),
+                                 'trufl.benchmark.time_stage': ('benchmark.html#time_stage', 'trufl/benchmark.py')},
+            'trufl.callbacks': { 'trufl.callbacks.Callback': ('callbacks.html#callback', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.Columns': ('callbacks.html#columns', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.Columns.__init__': ('callbacks.html#columns.__init__', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.Columns.concat': ('callbacks.html#columns.concat', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.Columns.items': ('callbacks.html#columns.items', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.Columns.set': ('callbacks.html#columns.set', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.Columns.to_frame': ('callbacks.html#columns.to_frame', 'trufl/callbacks.py'),
                                  'trufl.callbacks.CountCB': ('callbacks.html#countcb', 'trufl/callbacks.py'),
                                  'trufl.callbacks.CountCB.__call__': ('callbacks.html#countcb.__call__', 'trufl/callbacks.py'),
                                  'trufl.callbacks.CountCB.__init__': ('callbacks.html#countcb.__init__', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.CountCB.batch': ('callbacks.html#countcb.batch', 'trufl/callbacks.py'),
                                  'trufl.callbacks.MaxCB': ('callbacks.html#maxcb', 'trufl/callbacks.py'),
                                  'trufl.callbacks.MaxCB.__call__': ('callbacks.html#maxcb.__call__', 'trufl/callbacks.py'),
                                  'trufl.callbacks.MaxCB.__init__': ('callbacks.html#maxcb.__init__', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.MaxCB.batch': ('callbacks.html#maxcb.batch', 'trufl/callbacks.py'),
                                  'trufl.callbacks.MinCB': ('callbacks.html#mincb', 'trufl/callbacks.py'),
                                  'trufl.callbacks.MinCB.__call__': ('callbacks.html#mincb.__call__', 'trufl/callbacks.py'),
                                  'trufl.callbacks.MinCB.__init__': ('callbacks.html#mincb.__init__', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.MinCB.batch': ('callbacks.html#mincb.batch', 'trufl/callbacks.py'),
                                  'trufl.callbacks.MoranICB': ('callbacks.html#moranicb', 'trufl/callbacks.py'),
                                  'trufl.callbacks.MoranICB.__call__': ('callbacks.html#moranicb.__call__', 'trufl/callbacks.py'),
                                  'trufl.callbacks.MoranICB.__init__': ('callbacks.html#moranicb.__init__', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.MoranICB._morans': ('callbacks.html#moranicb._morans', 'trufl/callbacks.py'),
                                  'trufl.callbacks.MoranICB._weights': ('callbacks.html#moranicb._weights', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.MoranICB.affected': ('callbacks.html#moranicb.affected', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.MoranICB.batch': ('callbacks.html#moranicb.batch', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.MoranICB.fingerprint': ('callbacks.html#moranicb.fingerprint', 'trufl/callbacks.py'),
                                  'trufl.callbacks.PriorCB': ('callbacks.html#priorcb', 'trufl/callbacks.py'),
                                  'trufl.callbacks.PriorCB.__call__': ('callbacks.html#priorcb.__call__', 'trufl/callbacks.py'),
                                  'trufl.callbacks.PriorCB.__init__': ('callbacks.html#priorcb.__init__', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.PriorCB.affected': ('callbacks.html#priorcb.affected', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.PriorCB.batch': ('callbacks.html#priorcb.batch', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.PriorCB.fingerprint': ('callbacks.html#priorcb.fingerprint', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.ResultCache': ('callbacks.html#resultcache', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.ResultCache.__init__': ('callbacks.html#resultcache.__init__', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.ResultCache._set': ('callbacks.html#resultcache._set', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.ResultCache.close': ('callbacks.html#resultcache.close', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.ResultCache.get': ('callbacks.html#resultcache.get', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.ResultCache.set': ('callbacks.html#resultcache.set', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.StatCB': ('callbacks.html#statcb', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.StatCB.fingerprint': ('callbacks.html#statcb.fingerprint', 'trufl/callbacks.py'),
                                  'trufl.callbacks.State': ('callbacks.html#state', 'trufl/callbacks.py'),
                                  'trufl.callbacks.State.__call__': ('callbacks.html#state.__call__', 'trufl/callbacks.py'),
                                  'trufl.callbacks.State.__init__': ('callbacks.html#state.__init__', 'trufl/callbacks.py'),
                                  'trufl.callbacks.State._flatten': ('callbacks.html#state._flatten', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.coords': ('callbacks.html#state.coords', 'trufl/callbacks.py'),
                                  'trufl.callbacks.State.expand_to_k_nearest': ( 'callbacks.html#state.expand_to_k_nearest',
                                                                                 'trufl/callbacks.py'),
                                  'trufl.callbacks.State.get': ('callbacks.html#state.get', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.knn': ('callbacks.html#state.knn', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.map_locs': ('callbacks.html#state.map_locs', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.measurements': ('callbacks.html#state.measurements', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.neighbourhood': ('callbacks.html#state.neighbourhood', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.positions': ('callbacks.html#state.positions', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.run_batch': ('callbacks.html#state.run_batch', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.run_cached': ('callbacks.html#state.run_cached', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.run_cb': ('callbacks.html#state.run_cb', 'trufl/callbacks.py'),
                                  'trufl.callbacks.State.run_cbs': ('callbacks.html#state.run_cbs', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.running_stats': ('callbacks.html#state.running_stats', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.stat': ('callbacks.html#state.stat', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.tree': ('callbacks.html#state.tree', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.State.update': ('callbacks.html#state.update', 'trufl/callbacks.py'),
                                  'trufl.callbacks.StdCB': ('callbacks.html#stdcb', 'trufl/callbacks.py'),
                                  'trufl.callbacks.StdCB.__call__': ('callbacks.html#stdcb.__call__', 'trufl/callbacks.py'),
                                  'trufl.callbacks.StdCB.__init__': ('callbacks.html#stdcb.__init__', 'trufl/callbacks.py'),
-                                 'trufl.callbacks.Variable': ('callbacks.html#variable', 'trufl/callbacks.py')},
+                                 'trufl.callbacks.StdCB.batch': ('callbacks.html#stdcb.batch', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.Variable': ('callbacks.html#variable', 'trufl/callbacks.py'),
+                                 'trufl.callbacks._moran_chunk': ('callbacks.html#_moran_chunk', 'trufl/callbacks.py'),
+                                 'trufl.callbacks._run_chunk': ('callbacks.html#_run_chunk', 'trufl/callbacks.py'),
+                                 'trufl.callbacks._set_worker_state': ('callbacks.html#_set_worker_state', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.cb_config': ('callbacks.html#cb_config', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.digest': ('callbacks.html#digest', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.group_stats': ('callbacks.html#group_stats', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.knn_neighbours': ('callbacks.html#knn_neighbours', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.merge_stats': ('callbacks.html#merge_stats', 'trufl/callbacks.py'),
+                                 'trufl.callbacks.moran_i': ('callbacks.html#moran_i', 'trufl/callbacks.py')},
+            'trufl.campaign': { 'trufl.campaign.Campaign': ('campaign.html#campaign', 'trufl/campaign.py'),
+                                'trufl.campaign.Campaign.__init__': ('campaign.html#campaign.__init__', 'trufl/campaign.py'),
+                                'trufl.campaign.Campaign.allocations': ('campaign.html#campaign.allocations', 'trufl/campaign.py'),
+                                'trufl.campaign.Campaign.measurements': ('campaign.html#campaign.measurements', 'trufl/campaign.py'),
+                                'trufl.campaign.Campaign.resume': ('campaign.html#campaign.resume', 'trufl/campaign.py'),
+                                'trufl.campaign.Campaign.run': ('campaign.html#campaign.run', 'trufl/campaign.py'),
+                                'trufl.campaign.Campaign.run_round': ('campaign.html#campaign.run_round', 'trufl/campaign.py'),
+                                'trufl.campaign.Campaign.save': ('campaign.html#campaign.save', 'trufl/campaign.py'),
+                                'trufl.campaign.Campaign.summary': ('campaign.html#campaign.summary', 'trufl/campaign.py'),
+                                'trufl.campaign.empty_measurements': ('campaign.html#empty_measurements', 'trufl/campaign.py'),
+                                'trufl.campaign.timer': ('campaign.html#timer', 'trufl/campaign.py')},
             'trufl.collector': { 'trufl.collector.DataCollector': ('collector.html#datacollector', 'trufl/collector.py'),
                                  'trufl.collector.DataCollector.__init__': ('collector.html#datacollector.__init__', 'trufl/collector.py'),
+                                 'trufl.collector.DataCollector._block': ('collector.html#datacollector._block', 'trufl/collector.py'),
+                                 'trufl.collector.DataCollector._read': ('collector.html#datacollector._read', 'trufl/collector.py'),
                                  'trufl.collector.DataCollector.collect': ('collector.html#datacollector.collect', 'trufl/collector.py'),
                                  'trufl.collector.DataCollector.get_values': ( 'collector.html#datacollector.get_values',
-                                                                               'trufl/collector.py')},
+                                                                               'trufl/collector.py'),
+                                 'trufl.collector.DataCollector.sample': ('collector.html#datacollector.sample', 'trufl/collector.py'),
+                                 'trufl.collector.raster_memmap': ('collector.html#raster_memmap', 'trufl/collector.py')},
             'trufl.mcdm': { 'trufl.mcdm.abspearson': ('mcdm.html#abspearson', 'trufl/mcdm.py'),
+                            'trufl.mcdm.batch_score': ('mcdm.html#batch_score', 'trufl/mcdm.py'),
                             'trufl.mcdm.check_normalization_input': ('mcdm.html#check_normalization_input', 'trufl/mcdm.py'),
                             'trufl.mcdm.check_scoring_input': ('mcdm.html#check_scoring_input', 'trufl/mcdm.py'),
                             'trufl.mcdm.check_weighting_input': ('mcdm.html#check_weighting_input', 'trufl/mcdm.py'),
                             'trufl.mcdm.correlate': ('mcdm.html#correlate', 'trufl/mcdm.py'),
                             'trufl.mcdm.cp': ('mcdm.html#cp', 'trufl/mcdm.py'),
+                            'trufl.mcdm.cp_kernel': ('mcdm.html#cp_kernel', 'trufl/mcdm.py'),
                             'trufl.mcdm.critic': ('mcdm.html#critic', 'trufl/mcdm.py'),
                             'trufl.mcdm.dcor': ('mcdm.html#dcor', 'trufl/mcdm.py'),
+                            'trufl.mcdm.dist_cross_sum': ('mcdm.html#dist_cross_sum', 'trufl/mcdm.py'),
                             'trufl.mcdm.dist_matrix': ('mcdm.html#dist_matrix', 'trufl/mcdm.py'),
+                            'trufl.mcdm.dist_row_sums': ('mcdm.html#dist_row_sums', 'trufl/mcdm.py'),
                             'trufl.mcdm.em': ('mcdm.html#em', 'trufl/mcdm.py'),
+                            'trufl.mcdm.ideal_solutions': ('mcdm.html#ideal_solutions', 'trufl/mcdm.py'),
                             'trufl.mcdm.is_normalized_matrix': ('mcdm.html#is_normalized_matrix', 'trufl/mcdm.py'),
                             'trufl.mcdm.is_normalized_vector': ('mcdm.html#is_normalized_vector', 'trufl/mcdm.py'),
                             'trufl.mcdm.lin_func': ('mcdm.html#lin_func', 'trufl/mcdm.py'),
                             'trufl.mcdm.linear1': ('mcdm.html#linear1', 'trufl/mcdm.py'),
                             'trufl.mcdm.linear2': ('mcdm.html#linear2', 'trufl/mcdm.py'),
                             'trufl.mcdm.linear3': ('mcdm.html#linear3', 'trufl/mcdm.py'),
+                            'trufl.mcdm.multi_score': ('mcdm.html#multi_score', 'trufl/mcdm.py'),
                             'trufl.mcdm.mw': ('mcdm.html#mw', 'trufl/mcdm.py'),
                             'trufl.mcdm.normalize': ('mcdm.html#normalize', 'trufl/mcdm.py'),
                             'trufl.mcdm.pearson': ('mcdm.html#pearson', 'trufl/mcdm.py'),
@@ -64,19 +146,57 @@ d = { 'settings': { 'branch': 'main',
                             'trufl.mcdm.squared_dcov': ('mcdm.html#squared_dcov', 'trufl/mcdm.py'),
                             'trufl.mcdm.squared_dcov_matrix': ('mcdm.html#squared_dcov_matrix', 'trufl/mcdm.py'),
                             'trufl.mcdm.topsis': ('mcdm.html#topsis', 'trufl/mcdm.py'),
+                            'trufl.mcdm.topsis_kernel': ('mcdm.html#topsis_kernel', 'trufl/mcdm.py'),
                             'trufl.mcdm.vector': ('mcdm.html#vector', 'trufl/mcdm.py'),
                             'trufl.mcdm.vic': ('mcdm.html#vic', 'trufl/mcdm.py'),
                             'trufl.mcdm.weigh': ('mcdm.html#weigh', 'trufl/mcdm.py')},
             'trufl.optimizer': { 'trufl.optimizer.Optimizer': ('optimizer.html#optimizer', 'trufl/optimizer.py'),
                                  'trufl.optimizer.Optimizer.__init__': ('optimizer.html#optimizer.__init__', 'trufl/optimizer.py'),
-                                 'trufl.optimizer.Optimizer.get_rank': ('optimizer.html#optimizer.get_rank', 'trufl/optimizer.py')},
-            'trufl.reader': { 'trufl.reader.read_geojson': ('reader.html#read_geojson', 'trufl/reader.py'),
-                              'trufl.reader.read_shapefile': ('reader.html#read_shapefile', 'trufl/reader.py')},
+                                 'trufl.optimizer.Optimizer.get_rank': ('optimizer.html#optimizer.get_rank', 'trufl/optimizer.py'),
+                                 'trufl.optimizer.Optimizer.get_ranks': ('optimizer.html#optimizer.get_ranks', 'trufl/optimizer.py'),
+                                 'trufl.optimizer.Optimizer.normalized': ('optimizer.html#optimizer.normalized', 'trufl/optimizer.py'),
+                                 'trufl.optimizer.Optimizer.rank_stability': ( 'optimizer.html#optimizer.rank_stability',
+                                                                               'trufl/optimizer.py'),
+                                 'trufl.optimizer.scores_to_ranks': ('optimizer.html#scores_to_ranks', 'trufl/optimizer.py')},
+            'trufl.profiling': { 'trufl.profiling.Profiler': ('profiling.html#profiler', 'trufl/profiling.py'),
+                                 'trufl.profiling.Profiler.__call__': ('profiling.html#profiler.__call__', 'trufl/profiling.py'),
+                                 'trufl.profiling.Profiler.__init__': ('profiling.html#profiler.__init__', 'trufl/profiling.py'),
+                                 'trufl.profiling.Profiler.record': ('profiling.html#profiler.record', 'trufl/profiling.py'),
+                                 'trufl.profiling.Profiler.report': ('profiling.html#profiler.report', 'trufl/profiling.py'),
+                                 'trufl.profiling.Profiler.reset': ('profiling.html#profiler.reset', 'trufl/profiling.py'),
+                                 'trufl.profiling.profile': ('profiling.html#profile', 'trufl/profiling.py')},
+            'trufl.reader': { 'trufl.reader._use_arrow': ('reader.html#_use_arrow', 'trufl/reader.py'),
+                              'trufl.reader.read_geojson': ('reader.html#read_geojson', 'trufl/reader.py'),
+                              'trufl.reader.read_parquet': ('reader.html#read_parquet', 'trufl/reader.py'),
+                              'trufl.reader.read_shapefile': ('reader.html#read_shapefile', 'trufl/reader.py'),
+                              'trufl.reader.read_vector': ('reader.html#read_vector', 'trufl/reader.py'),
+                              'trufl.reader.validate_loc_ids': ('reader.html#validate_loc_ids', 'trufl/reader.py'),
+                              'trufl.reader.write_parquet': ('reader.html#write_parquet', 'trufl/reader.py')},
             'trufl.sampler': { 'trufl.sampler.Sampler': ('sampler.html#sampler', 'trufl/sampler.py'),
                                'trufl.sampler.Sampler.__init__': ('sampler.html#sampler.__init__', 'trufl/sampler.py'),
+                               'trufl.sampler.Sampler._sample_poisson': ('sampler.html#sampler._sample_poisson', 'trufl/sampler.py'),
                                'trufl.sampler.Sampler.loc_ids': ('sampler.html#sampler.loc_ids', 'trufl/sampler.py'),
                                'trufl.sampler.Sampler.sample': ('sampler.html#sampler.sample', 'trufl/sampler.py'),
-                               'trufl.sampler.rank_to_sample': ('sampler.html#rank_to_sample', 'trufl/sampler.py')},
-            'trufl.utils': { 'trufl.utils.anonymize_raster': ('utils.html#anonymize_raster', 'trufl/utils.py'),
+                               'trufl.sampler.Sampler.sample_xy': ('sampler.html#sampler.sample_xy', 'trufl/sampler.py'),
+                               'trufl.sampler._low_discrepancy': ('sampler.html#_low_discrepancy', 'trufl/sampler.py'),
+                               'trufl.sampler._positions': ('sampler.html#_positions', 'trufl/sampler.py'),
+                               'trufl.sampler._stratified': ('sampler.html#_stratified', 'trufl/sampler.py'),
+                               'trufl.sampler._to_bounds': ('sampler.html#_to_bounds', 'trufl/sampler.py'),
+                               'trufl.sampler._uniform': ('sampler.html#_uniform', 'trufl/sampler.py')},
+            'trufl.uncertainty': { 'trufl.uncertainty.Optimizer.get_acceptability': ( 'uncertainty.html#optimizer.get_acceptability',
+                                                                                      'trufl/uncertainty.py'),
+                                   'trufl.uncertainty._counts_chunk': ('uncertainty.html#_counts_chunk', 'trufl/uncertainty.py'),
+                                   'trufl.uncertainty._init_worker': ('uncertainty.html#_init_worker', 'trufl/uncertainty.py'),
+                                   'trufl.uncertainty.dirichlet_weights': ('uncertainty.html#dirichlet_weights', 'trufl/uncertainty.py'),
+                                   'trufl.uncertainty.rank_acceptability': ('uncertainty.html#rank_acceptability', 'trufl/uncertainty.py'),
+                                   'trufl.uncertainty.rank_counts': ('uncertainty.html#rank_counts', 'trufl/uncertainty.py')},
+            'trufl.utils': { 'trufl.utils._cells_count': ('utils.html#_cells_count', 'trufl/utils.py'),
+                             'trufl.utils._cells_std': ('utils.html#_cells_std', 'trufl/utils.py'),
+                             'trufl.utils._summed_area_tables': ('utils.html#_summed_area_tables', 'trufl/utils.py'),
+                             'trufl.utils._zonal_median': ('utils.html#_zonal_median', 'trufl/utils.py'),
+                             'trufl.utils.anonymize_raster': ('utils.html#anonymize_raster', 'trufl/utils.py'),
                              'trufl.utils.gridder': ('utils.html#gridder', 'trufl/utils.py'),
-                             'trufl.utils.reproject_raster': ('utils.html#reproject_raster', 'trufl/utils.py')}}}
+                             'trufl.utils.hex_gridder': ('utils.html#hex_gridder', 'trufl/utils.py'),
+                             'trufl.utils.quadtree_gridder': ('utils.html#quadtree_gridder', 'trufl/utils.py'),
+                             'trufl.utils.reproject_raster': ('utils.html#reproject_raster', 'trufl/utils.py'),
+                             'trufl.utils.zonal_stats': ('utils.html#zonal_stats', 'trufl/utils.py')}}}
@@ -0,0 +1,99 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/11_allocation.ipynb.
+
+# %% auto 0
+__all__ = ['POLICIES', 'allocate', 'weighted_policy', 'quantiles_policy', 'softmax_policy', 'proportional_policy',
+           'rank_to_sample']
+
+# %% ../nbs/11_allocation.ipynb 3
+import numpy as np
+from typing import Callable, Union
+
+# %% ../nbs/11_allocation.ipynb 5
+def allocate(weights:np.ndarray, # Non-negative weight of each area
+             budget:int, # Total number of samples to allocate
+             min:Union[int, np.ndarray]=0, # Minimum number of samples per area
+             max:Union[int, np.ndarray]=None, # Maximum number of samples per area (no cap if None)
+            ) -> np.ndarray: # Number of samples per area, summing to `budget`
+    "Allocate `budget` proportionally to `weights`, with at least `min` and at most `max` samples per area, by largest remainders."
+    w = np.asarray(weights, dtype=float)
+    lo = np.broadcast_to(np.asarray(min, dtype=float), w.shape)
+    hi = np.broadcast_to(np.inf if max is None else np.asarray(max, dtype=float), w.shape)
+    if np.any(w < 0) or np.any(np.isnan(w)): raise ValueError('Weights must be non-negative.')
+    if np.any(lo > hi): raise ValueError('`min` is greater than `max` for some areas.')
+    if not lo.sum() <= budget <= hi.sum():
+        raise ValueError(f'Budget {budget} cannot be allocated between {lo.sum():g} (sum of `min`) and {hi.sum():g} (sum of `max`).')
+    quotas = _water_fill(w, budget, lo, hi)
+    # Areas left without weighted capacity share what remains evenly
+    if budget - quotas.sum() > 1e-6 * budget: quotas = _water_fill((quotas < hi).astype(float), budget, quotas, hi)
+    counts = np.clip(np.floor(quotas + 1e-9), lo, hi)
+    k = int(budget - counts.sum())
+    if k >= 0:
+        remainders = np.where(counts < hi, quotas - counts, -np.inf)
+        counts[np.argsort(-remainders, kind='stable')[:k]] += 1
+    else:
+        # Quotas summing above the budget (rounding errors) are lowered on the smallest remainders above `lo`
+        remainders = np.where(counts > lo, quotas - counts, np.inf)
+        counts[np.argsort(remainders, kind='stable')[:-k]] -= 1
+    return counts.astype(int)
+
+# %% ../nbs/11_allocation.ipynb 6
+def _water_fill(w, budget, lo, hi):
+    "Continuous quotas `clip(t * w, lo, hi)`, the level `t` being such that they sum to `budget` if possible."
+    quotas = lambda t: np.where(w > 0, np.clip(t * w, lo, hi), lo)
+    pos, extra = w[w > 0], budget - lo.sum()
+    if extra <= 0: return lo.copy()
+    with np.errstate(invalid='ignore'):
+        if not len(pos) or quotas(np.inf).sum() <= budget: return quotas(np.inf)
+    # Bisection on log(t), weights possibly spanning many orders of magnitude (e.g. softmax), from a level where
+    # quotas sum to at most `lo.sum() + extra` to one where an area alone would get the whole budget
+    a, b = np.log(extra) - np.log(pos.sum()), np.log(budget) - np.log(pos.min())
+    for _ in range(100):
+        mid = (a + b) / 2
+        if mid in (a, b): break
+        if quotas(np.exp(mid)).sum() < budget: a = mid
+        else: b = mid
+    return quotas(np.exp(b))
+
+# %% ../nbs/11_allocation.ipynb 7
+def weighted_policy(ranks:np.ndarray) -> np.ndarray:
+    "Weights inversely proportional to ranks."
+    return 1 / np.asarray(ranks, dtype=float)
+
+def quantiles_policy(ranks:np.ndarray, 
+                     shares:tuple=(0.5, 0.3, 0.2, 0), # Share of the budget per rank quartile, best first
+                    ) -> np.ndarray:
+    "Split the budget between rank quartiles, evenly within each."
+    ranks = np.asarray(ranks)
+    quartiles = np.digitize(ranks, np.quantile(ranks, [0.25, 0.5, 0.75, 1.0]), right=True)
+    return np.asarray(shares, dtype=float)[quartiles] / np.bincount(quartiles, minlength=4)[quartiles]
+
+def softmax_policy(ranks:np.ndarray, 
+                   temperature:float=1., # The higher, the more uniform the allocation
+                  ) -> np.ndarray:
+    "Weights decaying exponentially with ranks."
+    ranks = np.asarray(ranks, dtype=float)
+    return np.exp(-(ranks - ranks.min()) / temperature)
+
+def proportional_policy(ranks:np.ndarray, 
+                        scores:np.ndarray=None, # Non-negative scores (e.g. from `Optimizer.get_rank`). Default to `n - rank + 1`.
+                       ) -> np.ndarray:
+    "Weights proportional to scores."
+    ranks = np.asarray(ranks, dtype=float)
+    return len(ranks) - ranks + 1 if scores is None else np.asarray(scores, dtype=float)
+
+POLICIES = {'Weighted': weighted_policy, 'quantiles': quantiles_policy, 
+            'softmax': softmax_policy, 'proportional': proportional_policy}
+
+# %% ../nbs/11_allocation.ipynb 8
+def rank_to_sample(ranks:np.ndarray, # Ranks sorted by `loc_id`s
+                   budget:int, # Total data collection budget available
+                   min:int=0, # Minimum of samples to be collected per area of interest
+                   policy:Union[str, Callable]="Weighted", # Name in `POLICIES` or function mapping ranks to weights
+                   max:Union[int, np.ndarray]=None, # Maximum of samples per area of interest (e.g. field capacity)
+                   **kwargs # Passed to the policy (e.g. `temperature` or `scores`)
+                  ) -> np.ndarray: # Number of samples per area of interest to be collected in the same order as ranks
+    "Map ranks to number of samples to be collected, spending exactly `budget`"
+    if not callable(policy):
+        if policy not in POLICIES: raise ValueError(f'Policy {policy} not implemented.')
+        policy = POLICIES[policy]
+    return allocate(policy(ranks, **kwargs), budget, min=min, max=max)
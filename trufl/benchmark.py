@@ -0,0 +1,169 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/09_benchmark.ipynb.
+
+# %% auto 0
+__all__ = ['SIZES', 'STAGES', 'IMPORTS', 'HEAVY_MODULES', 'GEO_MODULES', 'synthetic_raster', 'time_stage', 'import_time',
+           'run_benchmark', 'compare', 'main']
+
+# %% ../nbs/09_benchmark.ipynb 3
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import rasterio
+import fastcore.all as fc
+from datetime import datetime, timezone
+from fastcore.script import call_parse
+from rasterio.transform import from_bounds
+import trufl
+from .utils import gridder
+from .callbacks import State, MaxCB, MinCB, StdCB, CountCB, MoranICB, PriorCB
+from .optimizer import Optimizer
+from .sampler import Sampler, rank_to_sample
+from .collector import DataCollector
+
+# %% ../nbs/09_benchmark.ipynb 5
+def synthetic_raster(fname:str, # Path of the GeoTIFF to write
+                     size:int=1000, # Number of rows and columns
+                     n_blobs:int=8, # Number of Gaussian blobs of the smooth field
+                     seed:int=0, # Seed of the random number generator
+                    ) -> str: # `fname`
+    "Write a single band `float32` GeoTIFF over the unit square with a smooth, non-negative random field."
+    rng = np.random.default_rng(seed)
+    x = (np.arange(size) + 0.5) / size
+    data = np.zeros((size, size), dtype=np.float32)
+    for cx, cy, scale, height in zip(*rng.random((3, n_blobs)), rng.uniform(0.5, 1, n_blobs)):
+        data += height * np.outer(np.exp(-((x - cy) / (0.3 * scale))**2), np.exp(-((x - cx) / (0.3 * scale))**2))
+    data = np.maximum(data + rng.normal(0, 0.01, data.shape).astype(np.float32), 0)
+    with rasterio.open(fname, 'w', driver='GTiff', height=size, width=size, count=1, dtype='float32', 
+                       crs='EPSG:4326', transform=from_bounds(0, 0, 1, 1, size, size)) as dst:
+        dst.write(data, 1)
+    return fname
+
+# %% ../nbs/09_benchmark.ipynb 7
+SIZES = {'small': {'n_cells': 10, 'n_measurements': 1_000, 'raster_size': 500},
+         'medium': {'n_cells': 100, 'n_measurements': 100_000, 'raster_size': 2_000},
+         'large': {'n_cells': 1_000, 'n_measurements': 10_000_000, 'raster_size': 5_000}}
+
+# %% ../nbs/09_benchmark.ipynb 9
+def _ranks(ctx): 
+    return Optimizer(ctx['state']).get_rank([True, True, True, False, True], [0.2, 0.2, 0.2, 0.2, 0.2], 
+                                            n_method='LINEAR1', s_method='CP', as_frame=False)
+
+STAGES = {
+    'gridder': lambda ctx: gridder(ctx['fname'], nrows=ctx['n_cells'], ncols=ctx['n_cells']),
+    'rank_to_sample': lambda ctx: rank_to_sample(np.arange(len(ctx['gridder'])) + 1, ctx['n_measurements'], 
+                                                 policy='Weighted'),
+    'sample': lambda ctx: Sampler(ctx['gridder']).sample(ctx['rank_to_sample'], rng=0),
+    'collect': lambda ctx: DataCollector(ctx['fname']).collect(ctx['sample']),
+    'state': lambda ctx: State(ctx['collect'], ctx['gridder'], [MaxCB(), MinCB(), StdCB(), CountCB()])(),
+    'prior': lambda ctx: State(ctx['collect'], ctx['gridder'], [PriorCB(ctx['fname'])])(),
+    'moran': lambda ctx: State(ctx['collect'], ctx['gridder'], [MoranICB(k=5, seed=0)])(),
+    'rank': lambda ctx: _ranks({'state': ctx['state'].join(ctx['prior'])}),
+}
+
+# %% ../nbs/09_benchmark.ipynb 10
+def time_stage(f, # Function of the context to time
+               ctx:dict, # Context
+               repeat:int=3, # Number of timed runs
+              ) -> tuple: # Output of `f`, best time (in seconds) and peak memory (in bytes) allocated by `f`
+    "Time the best of `repeat` runs of `f` and trace the peak memory of one more run."
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        out = f(ctx)
+        times.append(time.perf_counter() - start)
+    # Tracing slows down allocations, hence a separate run
+    del out; gc.collect()
+    tracemalloc.start()
+    try: out = f(ctx); _, peak = tracemalloc.get_traced_memory()
+    finally: tracemalloc.stop()
+    return out, min(times), peak
+
+# %% ../nbs/09_benchmark.ipynb 12
+IMPORTS = ['trufl.mcdm', 'trufl.allocation', 'trufl.optimizer', 'trufl.sampler', 'trufl.callbacks', 
+           'trufl.collector', 'trufl.utils']
+HEAVY_MODULES = ['pandas', 'scipy', 'geopandas', 'shapely', 'pyproj', 'rasterio', 'fastcore']
+GEO_MODULES = ['geopandas', 'shapely', 'pyproj', 'rasterio']
+
+_import_script = """
+import sys, time, tracemalloc, json
+tracemalloc.start()
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'time': seconds, 'peak_memory': tracemalloc.get_traced_memory()[1], 
+                  'modules': sorted({{m.split('.')[0] for m in sys.modules}})}}))
+"""
+
+def import_time(module:str # Name of the module to import
+               ) -> dict: # Time (in seconds), peak memory (in bytes) and top-level modules loaded
+    "Time the import of `module` in a fresh Python interpreter."
+    out = subprocess.run([sys.executable, '-c', _import_script.format(module=module)], 
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+# %% ../nbs/09_benchmark.ipynb 14
+def run_benchmark(sizes:list=('small',), # Names of `SIZES` to run
+                  stages:list=None, # Names of `STAGES` to run (and the ones they depend on). Default to all.
+                  repeat:int=3, # Number of timed runs per stage
+                  raster_dir:str=None, # Where to write synthetic rasters. Default to a temporary directory.
+                  imports:list=IMPORTS, # Modules whose import to time, as stages of size 'import'
+                 ) -> dict: # Environment and one result per size and stage
+    "Time and trace the memory of each stage of the pipeline for each size."
+    results = []
+    for module in imports:
+        r = import_time(module)
+        results.append({'size': 'import', 'stage': module, 'time': r['time'], 'peak_memory': r['peak_memory']})
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            params = SIZES[size]
+            fname = synthetic_raster(os.path.join(raster_dir or tmp, f'synthetic-{params["raster_size"]}.tif'), 
+                                     params['raster_size'])
+            ctx = {'fname': fname, **params}
+            for stage, f in STAGES.items():
+                out, seconds, peak = time_stage(f, ctx, repeat if stages is None or stage in stages else 1)
+                ctx[stage] = out
+                if stages is None or stage in stages:
+                    results.append({'size': size, **params, 'stage': stage, 'time': seconds, 'peak_memory': peak})
+    return {'environment': {'trufl': trufl.__version__, 'python': platform.python_version(), 
+                            'numpy': np.__version__, 'platform': platform.platform(), 
+                            'date': datetime.now(timezone.utc).isoformat()},
+            'results': results}
+
+# %% ../nbs/09_benchmark.ipynb 16
+def compare(results:dict, # As returned by `run_benchmark`
+            baseline:dict, # As returned by `run_benchmark`
+            threshold:float=0.2, # Relative slowdown above which a stage regresses
+           ) -> pd.DataFrame: # Time, baseline time, their ratio and whether it regresses per size and stage
+    "Compare the times of `results` with the ones of `baseline`."
+    df, df_base = (pd.DataFrame(r['results']).set_index(['size', 'stage']) for r in (results, baseline))
+    df = df[['time']].join(df_base['time'].rename('baseline'), how='inner')
+    return df.assign(ratio=df.time / df.baseline, regression=df.time > (1 + threshold) * df.baseline)
+
+# %% ../nbs/09_benchmark.ipynb 17
+@call_parse
+def main(sizes:str='small', # Comma-separated names of sizes among small, medium and large
+         stages:str=None, # Comma-separated names of stages (or modules whose import to time) to run. Default to all.
+         repeat:int=3, # Number of timed runs per stage
+         output:str=None, # Path of the JSON file where to write the results
+         baseline:str=None, # Path of the JSON results to compare with
+         threshold:float=0.2, # Relative slowdown above which a stage regresses
+        ):
+    "Run trufl's benchmarks, exiting with an error if a stage regressed compared to `baseline`."
+    results = run_benchmark(sizes.split(','), stages and stages.split(','), repeat, 
+                            imports=IMPORTS if stages is None else [s for s in IMPORTS if s in stages.split(',')])
+    if output is not None: 
+        with open(output, 'w') as f: json.dump(results, f, indent=2)
+    print(pd.DataFrame(results['results']).set_index(['size', 'stage'])[['time', 'peak_memory']].to_string())
+    if baseline is not None:
+        with open(baseline) as f: df = compare(results, json.load(f), threshold)
+        print(df.to_string())
+        if df.regression.any(): sys.exit(1)
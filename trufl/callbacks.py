@@ -1,52 +1,150 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/04_callbacks.ipynb.
 
 # %% auto 0
-__all__ = ['Variable', 'Callback', 'State', 'MaxCB', 'MinCB', 'StdCB', 'CountCB', 'MoranICB', 'PriorCB']
+__all__ = ['Variable', 'Columns', 'Callback', 'digest', 'cb_config', 'ResultCache', 'State', 'group_stats', 'merge_stats',
+           'StatCB', 'MaxCB', 'MinCB', 'StdCB', 'CountCB', 'knn_neighbours', 'moran_i', 'MoranICB', 'PriorCB']
 
 # %% ../nbs/04_callbacks.ipynb 2
 from dataclasses import dataclass
 
-import warnings
-warnings.filterwarnings("ignore", category=UserWarning, message="The weights matrix is not fully connected")
-
 # %% ../nbs/04_callbacks.ipynb 3
-from pysal.lib import weights
-from pysal.explore import esda
 import itertools
+import hashlib
+import shelve
+from collections import OrderedDict
 import fastcore.all as fc
 from fastcore.basics import patch
 import numpy as np
-from scipy.spatial import KDTree
-import geopandas as gpd
 from typing import List
 from collections.abc import Callable
-import rasterio
-from rasterio.mask import mask
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import os
 import pandas as pd
 from typing import Type
 
-# %% ../nbs/04_callbacks.ipynb 5
+from .profiling import Profiler, profile
+
+# %% ../nbs/04_callbacks.ipynb 6
 @dataclass
 class Variable:
     "State variable"
+    __slots__ = ('name', 'value') # Lightweight record, returned by per-location Callbacks and `State.get`
     name: str
     value: float
 
-# %% ../nbs/04_callbacks.ipynb 6
-class Callback(): pass
+# %% ../nbs/04_callbacks.ipynb 7
+class Columns:
+    "Preallocated float64 columns of State variables keyed by name, filled by position."
+    def __init__(self, 
+                 n:int # Number of rows (areas)
+                ): 
+        self.n, self.data = n, {}
+
+    def set(self, 
+            name:str, # Variable name
+            values, # Value(s) to set
+            idx=slice(None) # Position(s) of the rows to set. Default to all.
+           ):
+        if name not in self.data: self.data[name] = np.full(self.n, np.nan)
+        self.data[name][idx] = values
+
+    def items(self): return self.data.items()
+
+    def to_frame(self, index:pd.Index) -> pd.DataFrame: return pd.DataFrame(self.data, index=index, copy=False)
+
+    @classmethod
+    def concat(cls, columns:list):
+        "Stack `Columns` of consecutive rows."
+        res = cls(sum(c.n for c in columns))
+        for name in dict.fromkeys(itertools.chain(*(c.data for c in columns))):
+            res.data[name] = np.concatenate([c.data.get(name, np.full(c.n, np.nan)) for c in columns])
+        return res
 
 # %% ../nbs/04_callbacks.ipynb 8
+class Callback():
+    "Base class of `State`'s callbacks. Implement `batch` to compute all `loc_id`s at once and `affected` to select `loc_id`s to recompute on `State.update`."
+    exec_args = () # Arguments only changing how results are computed (e.g. parallelism), left out of fingerprints
+
+# %% ../nbs/04_callbacks.ipynb 9
+def digest(*parts) -> str:
+    "Hex digest of `parts`: NumPy arrays and bytes are hashed as raw bytes, other objects through their `repr`."
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        data = part.tobytes() if isinstance(part, np.ndarray) else part if isinstance(part, bytes) else repr(part).encode()
+        h.update(len(data).to_bytes(8, 'little') + data)
+    return h.hexdigest()
+
+def cb_config(cb:Callback) -> tuple:
+    "Class name and arguments of a Callback, as part of its results' fingerprints."
+    exec_args = getattr(cb, 'exec_args', ())
+    return type(cb).__name__, sorted((k, v) for k, v in getattr(cb, '__stored_args__', {}).items() if k not in exec_args)
+
+# %% ../nbs/04_callbacks.ipynb 10
+class ResultCache:
+    "LRU cache of Callbacks' results per area, keyed by fingerprints, optionally persisted on disk."
+    def __init__(self, 
+                 max_size:int=2**16, # Maximum number of results kept in memory
+                 path:str=None, # Path of a `shelve` store persisting results across sessions
+                ):
+        fc.store_attr()
+        self.store = OrderedDict()
+        self.disk = shelve.open(path) if path else None
+        self.hits, self.misses = 0, 0
+
+    def get(self, key:str):
+        "Result stored under `key` or None, counting hits and misses."
+        if key in self.store:
+            self.store.move_to_end(key)
+        elif self.disk is not None and key in self.disk:
+            self._set(key, self.disk[key])
+        else:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.store[key]
+
+    def set(self, key:str, value):
+        "Store `value` under `key`, in memory and on disk if any."
+        self._set(key, value)
+        if self.disk is not None: self.disk[key] = value
+
+    def _set(self, key, value):
+        self.store[key] = value
+        self.store.move_to_end(key)
+        while len(self.store) > self.max_size: self.store.popitem(last=False)
+
+    def close(self):
+        if self.disk is not None: self.disk.close()
+
+# %% ../nbs/04_callbacks.ipynb 12
 class State:
     def __init__(self, 
-                 measurements:gpd.GeoDataFrame, # Measurements data with `loc_id`, `geometry` and `value` columns. 
-                 smp_areas:gpd.GeoDataFrame, # Grid of areas/polygons of interest with `loc_id` and `geometry`.
+                 measurements:'gpd.GeoDataFrame', # Measurements data with `loc_id`, `geometry` and `value` columns. 
+                 smp_areas:'gpd.GeoDataFrame', # Grid of areas/polygons of interest with `loc_id` and `geometry`.
                  cbs:List[Callable], # List of Callback functions returning `Variable`s.
+                 executor:str='serial', # How per-location Callbacks run over `loc_id`s: 'serial', 'thread' or 'process'
+                 n_workers:int=None, # Number of threads or processes. Default to the number of CPUs.
+                 chunk_size:int=None, # Number of `loc_id`s per task. Default to about 4 tasks per worker.
+                 result_cache:ResultCache=None, # Cache of the results of Callbacks implementing `fingerprint`
+                 profiler:Profiler=None, # Profiler timing each Callback, if any
                 ): 
         "Collect various variables/metrics per grid cell/administrative unit."
         fc.store_attr()
         self.unsampled_locs = self.smp_areas.index.difference(self.measurements.index)
+        self.cache = {} # Callbacks' results not depending on measurements, kept for the State's lifetime
+        self.results = None # Last computed State variables, updated incrementally by `update`
 
-# %% ../nbs/04_callbacks.ipynb 9
+    @property
+    def measurements(self): return self._measurements
+
+    @measurements.setter
+    def measurements(self, measurements:'gpd.GeoDataFrame'):
+        "Set measurements and invalidate the structures derived from them (coordinates, KDTree, ...)."
+        self._measurements = measurements
+        self.derived = {}
+
+# %% ../nbs/04_callbacks.ipynb 13
 @patch
 def get(self:State, 
         loc_id:str, # Unique id of the Point feature
@@ -60,43 +158,254 @@ def get(self:State,
     else:
         return variables
 
-# %% ../nbs/04_callbacks.ipynb 10
+# %% ../nbs/04_callbacks.ipynb 14
 @patch
 def __call__(self:State, loc_id=None, **kwargs):
     "Get the state variables as defined by `cbs` for all `loc_id`s as a dataframe."
     loc_ids = self.smp_areas.index
-    results = [{v.name: v.value for v in self.run_cbs(loc_id)} | {'loc_id': loc_id} for loc_id in loc_ids]
-    return pd.DataFrame(results).set_index('loc_id')
+    self.results = self.run_batch(loc_ids).to_frame(pd.Index(loc_ids, name='loc_id'))
+    return self.results.copy()
+
+# %% ../nbs/04_callbacks.ipynb 15
+@patch(as_prop=True)
+def coords(self:State) -> np.ndarray: # Array of shape (n_measurements, 2)
+    "Coordinates of measurements, computed once per set of measurements."
+    if 'coords' not in self.derived: self.derived['coords'] = self.measurements.get_coordinates().values
+    return self.derived['coords']
 
-# %% ../nbs/04_callbacks.ipynb 11
+@patch(as_prop=True)
+def tree(self:State) -> 'scipy.spatial.KDTree':
+    "KDTree of measurements, built lazily once per set of measurements and shared across callbacks."
+    # Geospatial and stats dependencies are imported on first use to keep `import trufl.callbacks` fast
+    from scipy.spatial import KDTree
+    if 'tree' not in self.derived: self.derived['tree'] = KDTree(self.coords)
+    return self.derived['tree']
+
+# %% ../nbs/04_callbacks.ipynb 16
+@patch
+def knn(self:State, 
+        k:int=5, # Number of nearest neighbours
+        return_distance:bool=False, # Whether to also return the distances to the neighbours
+       ) -> np.ndarray: # Positional indices of shape (n_measurements, k) (preceded by distances if `return_distance`)
+    "Positional indices of the `k` nearest neighbours of all measurements, queried in bulk once per set of measurements."
+    if ('knn', k) not in self.derived: 
+        self.derived[('knn', k)] = self.tree.query(self.coords, k=k)
+    distances, indices = self.derived[('knn', k)]
+    return (distances, indices) if return_distance else indices
+
+# %% ../nbs/04_callbacks.ipynb 17
+@patch
+def positions(self:State, 
+              loc_id:int, # Unique id of an individual area of interest.
+             ) -> np.ndarray: # Positional indices of the measurements in `loc_id`
+    "Positional indices of measurements per `loc_id`, grouped once per set of measurements."
+    if 'positions' not in self.derived: self.derived['positions'] = self.measurements.groupby(level=0).indices
+    return self.derived['positions'].get(loc_id, np.array([], dtype=int))
+
+# %% ../nbs/04_callbacks.ipynb 18
 @patch
 def expand_to_k_nearest(self:State, 
-                        subset_measurements:gpd.GeoDataFrame, # Measurements for which Variables are computed.
+                        subset_measurements:'gpd.GeoDataFrame', # Measurements for which Variables are computed.
                         k:int=5, # Number of nearest neighbours (possibly belonging to adjacent cells/admin. units to consider).
                        ):
     "Expand measurements of concern possibly to nearest neighbors of surrounding grid cells."
-    tree = KDTree(self.measurements.geometry.apply(lambda p: (p.x, p.y)).tolist());
-    _, indices = tree.query(subset_measurements.geometry.apply(lambda p: (p.x, p.y)).tolist(), k=k)
+    _, indices = self.tree.query(subset_measurements.get_coordinates().values, k=k)
     return self.measurements.iloc[indices.flatten()].reset_index(drop=True)
 
-# %% ../nbs/04_callbacks.ipynb 12
+# %% ../nbs/04_callbacks.ipynb 19
+@patch
+def neighbourhood(self:State, 
+                  loc_id:int, # Unique id of an individual area of interest.
+                  k:int=5, # Number of nearest neighbours (possibly belonging to adjacent cells/admin. units to consider).
+                 ) -> np.ndarray: # Positional indices of the expanded measurements
+    "Positional indices of `loc_id`'s measurements expanded to their `k` nearest neighbours (see `expand_to_k_nearest`)."
+    return self.knn(k)[self.positions(loc_id)].flatten()
+
+# %% ../nbs/04_callbacks.ipynb 20
 @patch
 def _flatten(self:State, variables):
     "Flatten list of variables potentially containing both scalar and tuples."
     return list(itertools.chain(*(v if isinstance(v, tuple) else (v,) 
                                   for v in variables)))
 
-# %% ../nbs/04_callbacks.ipynb 13
+# %% ../nbs/04_callbacks.ipynb 21
 @patch
 def run_cbs(self:State, loc_id):
     "Run Callbacks sequentially and flatten the results if required."
     variables = []
     for cb in self.cbs:
-        variables.append(cb(loc_id, self))
+        with profile(self.profiler, type(cb).__name__): variables.append(cb(loc_id, self))
     return self._flatten(variables)
 
-# %% ../nbs/04_callbacks.ipynb 15
-class MaxCB(Callback):
+# %% ../nbs/04_callbacks.ipynb 22
+def group_stats(measurements:'gpd.GeoDataFrame' # Measurements indexed by `loc_id` with a `value` column
+               ) -> pd.DataFrame: # Number of measurements ('size'), of valid values ('count'), their 'mean', 'm2', 'min' and 'max' per `loc_id`
+    "Streaming-friendly statistics of measurements' `value` per `loc_id`, `m2` being the sum of squared deviations from the mean."
+    stats = measurements.groupby(level=0).value.agg(['size', 'count', 'mean', 'min', 'max'])
+    stats['m2'] = measurements.groupby(level=0).value.var(ddof=0) * stats['count']
+    return stats
+
+def merge_stats(stats_a:pd.DataFrame, # Statistics as returned by `group_stats`
+                stats_b:pd.DataFrame # Statistics of other measurements as returned by `group_stats`
+               ) -> pd.DataFrame: # Statistics of both sets of measurements
+    "Merge statistics of two sets of measurements per `loc_id` (parallel variant of Welford's algorithm by Chan et al.)."
+    idx = stats_a.index.union(stats_b.index)
+    a, b = stats_a.reindex(idx), stats_b.reindex(idx)
+    n_a, n_b = a['count'].fillna(0).values, b['count'].fillna(0).values
+    mean_a, mean_b = np.nan_to_num(a['mean'].values), np.nan_to_num(b['mean'].values)
+    n, delta = n_a + n_b, mean_b - mean_a
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(n > 0, mean_a + delta * n_b / n, np.nan)
+        m2 = np.nan_to_num(a['m2'].values) + np.nan_to_num(b['m2'].values) + np.where(n > 0, delta**2 * n_a * n_b / n, 0)
+    return pd.DataFrame({'size': a['size'].fillna(0).values + b['size'].fillna(0).values, 'count': n, 'mean': mean, 
+                         'min': np.fmin(a['min'].values, b['min'].values), 'max': np.fmax(a['max'].values, b['max'].values), 
+                         'm2': np.where(n > 0, m2, np.nan)}, index=idx)
+
+# %% ../nbs/04_callbacks.ipynb 23
+@patch(as_prop=True)
+def running_stats(self:State) -> pd.DataFrame: # Statistics per `loc_id` as returned by `group_stats`
+    "Statistics of measurements per `loc_id`, computed once per set of measurements and merged on `update`."
+    if 'stats' not in self.derived: self.derived['stats'] = group_stats(self.measurements)
+    return self.derived['stats']
+
+@patch
+def stat(self:State, 
+         name:str, # One of 'size', 'count', 'mean', 'std', 'min' and 'max'
+         loc_ids=None, # Unique ids of the areas of interest. Default to all `smp_areas`.
+        ) -> np.ndarray: # Statistic aligned with `loc_ids` (NaN for unsampled areas)
+    "Running statistic of measurements' `value` per `loc_id`."
+    loc_ids = self.smp_areas.index if loc_ids is None else loc_ids
+    stats = self.running_stats
+    values = np.sqrt(stats['m2'] / stats['count']) if name == 'std' else stats[name]
+    return values.reindex(loc_ids).to_numpy(dtype=float)
+
+# %% ../nbs/04_callbacks.ipynb 24
+@patch
+def run_batch(self:State, 
+              loc_ids, # Unique ids of the areas of interest.
+              cbs:list=None # Callbacks to run. Default to all State's `cbs`.
+             ):
+    "Run Callbacks for all `loc_ids` at once, falling back to per-location calls if a Callback has no `batch` method."
+    columns = Columns(len(loc_ids))
+    for cb in self.cbs if cbs is None else cbs:
+        cached = self.result_cache is not None and hasattr(cb, 'fingerprint')
+        with profile(self.profiler, type(cb).__name__, len(loc_ids)): 
+            results = (self.run_cached if cached else self.run_cb)(cb, loc_ids)
+        for name, values in results.items(): columns.set(name, values)
+    return columns
+
+@patch
+def run_cb(self:State, 
+           cb:Callback, # One of State's `cbs`
+           loc_ids, # Unique ids of the areas of interest.
+          ) -> dict: # Arrays of values aligned with `loc_ids` keyed by `Variable` name
+    "Run a Callback for all `loc_ids`, in batch if implemented."
+    if not hasattr(cb, 'batch'): return self.map_locs(cb, loc_ids).data
+    return {v.name: np.asarray(v.value) for v in self._flatten([cb.batch(loc_ids, self)])}
+
+# %% ../nbs/04_callbacks.ipynb 25
+_worker_state = None
+
+def _set_worker_state(o):
+    "Keep the State in the worker process: inherited at no cost when workers are forked, pickled once per worker otherwise."
+    global _worker_state
+    _worker_state = o
+
+def _run_chunk(loc_ids, cb_idx, o=None):
+    "Run the `cb_idx`-th Callback of State `o` (default to the worker's State) for each of `loc_ids`, filling `Columns`."
+    o = _worker_state if o is None else o
+    cb, columns = o.cbs[cb_idx], Columns(len(loc_ids))
+    for i, loc_id in enumerate(loc_ids):
+        for v in o._flatten([cb(loc_id, o)]): columns.set(v.name, v.value, i)
+    return columns
+
+# %% ../nbs/04_callbacks.ipynb 26
+@patch
+def map_locs(self:State, 
+             cb:Callback, # One of State's `cbs`
+             loc_ids, # Unique ids of the areas of interest.
+            ) -> Columns: # Variables of each `loc_id`, in `loc_ids` order
+    "Run a per-location Callback for all `loc_ids`, serially or by chunks on the State's `executor`."
+    if self.executor == 'serial' or len(loc_ids) < 2: return _run_chunk(loc_ids, self.cbs.index(cb), self)
+    n_workers = self.n_workers or os.cpu_count()
+    size = self.chunk_size or -(-len(loc_ids) // (4 * n_workers))
+    chunks = [loc_ids[i:i + size] for i in range(0, len(loc_ids), size)]
+    args = (chunks, itertools.repeat(self.cbs.index(cb)))
+    if self.executor == 'thread':
+        with ThreadPoolExecutor(n_workers) as ex: results = list(ex.map(_run_chunk, *args, itertools.repeat(self)))
+    elif self.executor == 'process':
+        # Forked workers inherit measurements and areas rather than receiving them with each task
+        ctx = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        with ProcessPoolExecutor(n_workers, mp_context=ctx, initializer=_set_worker_state, initargs=(self,)) as ex: 
+            results = list(ex.map(_run_chunk, *args))
+    else:
+        raise ValueError(f'Executor {self.executor} not implemented.')
+    return Columns.concat(results)
+
+# %% ../nbs/04_callbacks.ipynb 28
+@patch
+def run_cached(self:State, 
+               cb:Callback, # One of State's `cbs`, implementing `fingerprint`
+               loc_ids, # Unique ids of the areas of interest.
+              ) -> dict: # Arrays of values aligned with `loc_ids` keyed by `Variable` name
+    "Run a Callback for the `loc_ids` whose fingerprint is not in the State's `result_cache`."
+    keys = cb.fingerprint(loc_ids, self)
+    results = [None if key is None else self.result_cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        columns = self.run_cb(cb, pd.Index(loc_ids)[missing])
+        for j, i in enumerate(missing):
+            results[i] = {name: values[j] for name, values in columns.items()}
+            if keys[i] is not None: self.result_cache.set(keys[i], results[i])
+    names = list(results[0]) if results else []
+    return {name: np.array([result[name] for result in results]) for name in names}
+
+# %% ../nbs/04_callbacks.ipynb 37
+@patch
+def update(self:State, 
+           new_measurements:'gpd.GeoDataFrame', # New measurements with the same columns as `measurements`
+          ) -> pd.DataFrame: # State variables of all `loc_id`s, as returned by calling the State
+    "Append new measurements and recompute the variables of affected `loc_id`s only."
+    if self.results is None: self()
+    if not len(new_measurements): return self.results.copy()
+
+    # Areas to recompute per Callback, assessed before measurements are appended
+    new_locs = new_measurements.index.unique()
+    affected = [cb.affected(new_measurements, self) if hasattr(cb, 'affected') else new_locs for cb in self.cbs]
+
+    n_old = len(self.measurements)
+    positions = dict(self.derived.get('positions') or self.measurements.groupby(level=0).indices)
+    for loc_id, pos in new_measurements.groupby(level=0).indices.items():
+        positions[loc_id] = np.concatenate([positions.get(loc_id, np.array([], dtype=int)), pos + n_old])
+    derived = {'coords': np.vstack([self.coords, new_measurements.get_coordinates().values]), 
+               'positions': positions, 
+               'stats': merge_stats(self.running_stats, group_stats(new_measurements))}
+
+    self.measurements = pd.concat([self.measurements, new_measurements])
+    self.derived.update(derived)
+    self.unsampled_locs = self.unsampled_locs.difference(new_locs)
+
+    loc_ids = self.smp_areas.index
+    for cb, locs in zip(self.cbs, affected):
+        locs = loc_ids[loc_ids.isin(locs)]
+        if not len(locs): continue
+        for name, values in self.run_batch(locs, [cb]).items(): self.results.loc[locs, name] = values
+    return self.results.copy()
+
+# %% ../nbs/04_callbacks.ipynb 39
+class StatCB(Callback):
+    "Base class of Callbacks computing a statistic of the measurements' values in each area."
+
+    def fingerprint(self, 
+                    loc_ids, # Unique ids of the areas of interest.
+                    o:Type[State] # A State's object
+                   ):
+        "Results only depend on the values of the measurements in each area."
+        values, config = o.measurements['value'].values, cb_config(self)
+        return [digest(config, values[o.positions(loc_id)]) for loc_id in loc_ids]
+
+# %% ../nbs/04_callbacks.ipynb 40
+class MaxCB(StatCB):
     "Compute Maximum value of measurements at given location."
     def __init__(self, name='Max'): fc.store_attr()
     def __call__(self, 
@@ -107,8 +416,14 @@ class MaxCB(Callback):
         return Variable(self.name, 
                         np.max(o.measurements.loc[[loc_id]].value.values))
 
-# %% ../nbs/04_callbacks.ipynb 16
-class MinCB(Callback):
+    def batch(self, 
+              loc_ids, # Unique ids of the areas of interest.
+              o:Type[State] # A State's object
+             ):
+        return Variable(self.name, o.stat('max', loc_ids))
+
+# %% ../nbs/04_callbacks.ipynb 41
+class MinCB(StatCB):
     "Compute Minimum value of measurements at given location."
     def __init__(self, name='Min'): fc.store_attr()
     def __call__(self, 
@@ -119,8 +434,14 @@ class MinCB(Callback):
         return Variable(self.name, 
                     np.min(o.measurements.loc[[loc_id]].value.values))
 
-# %% ../nbs/04_callbacks.ipynb 17
-class StdCB(Callback):
+    def batch(self, 
+              loc_ids, # Unique ids of the areas of interest.
+              o:Type[State] # A State's object
+             ):
+        return Variable(self.name, o.stat('min', loc_ids))
+
+# %% ../nbs/04_callbacks.ipynb 42
+class StdCB(StatCB):
     "Compute Standard deviation of measurements at given location."
     def __init__(self, name='Standard Deviation'): fc.store_attr()
     def __call__(self, 
@@ -131,8 +452,14 @@ class StdCB(Callback):
         return Variable(self.name, 
                     np.std(o.measurements.loc[[loc_id]].value.values))
 
-# %% ../nbs/04_callbacks.ipynb 18
-class CountCB(Callback):
+    def batch(self, 
+              loc_ids, # Unique ids of the areas of interest.
+              o:Type[State] # A State's object
+             ):
+        return Variable(self.name, o.stat('std', loc_ids))
+
+# %% ../nbs/04_callbacks.ipynb 43
+class CountCB(StatCB):
     "Compute the number of measurements at given location."
     def __init__(self, name='Count'): fc.store_attr()
     def __call__(self, 
@@ -143,33 +470,176 @@ class CountCB(Callback):
         return Variable(self.name, 
                         len(o.measurements.loc[[loc_id]].value.values))
 
-# %% ../nbs/04_callbacks.ipynb 19
+    def batch(self, 
+              loc_ids, # Unique ids of the areas of interest.
+              o:Type[State] # A State's object
+             ):
+        return Variable(self.name, o.stat('size', loc_ids))
+
+# %% ../nbs/04_callbacks.ipynb 49
+def knn_neighbours(coords:np.ndarray, # Points coordinates of shape (n, 2)
+                   k:int=5, # Number of nearest neighbours
+                  ) -> np.ndarray: # Indices of shape (n, k) of each point's neighbours
+    "K-nearest neighbours of each point excluding itself, as defined in `libpysal.weights.KNN`."
+    from scipy.spatial import KDTree
+    _, idx = KDTree(coords).query(coords, k=k+1)
+    not_self = idx != np.arange(len(coords))[:, None]
+    # With duplicated points, a point might not be among its own k+1 nearest neighbours
+    not_self[not_self.sum(axis=1) == k+1, -1] = False
+    return idx[not_self].reshape(len(coords), k)
+
+# %% ../nbs/04_callbacks.ipynb 50
+def _moran_chunk(ys:list, nbrs:list, seeds:list, permutations:int):
+    "Moran's I and pseudo p-values of a chunk of areas, vectorized over areas and permutations."
+    from scipy import sparse
+    ns = np.array([len(y) for y in ys])
+    A, n_max, k = len(ys), ns.max(), nbrs[0].shape[1]
+    # Pad areas to `n_max`: padded values are zero and left unpermuted so that they never contribute
+    z = np.zeros((A, n_max))
+    perms = np.broadcast_to(np.arange(n_max), (A, permutations, n_max)).copy()
+    rows, cols = [], []
+    for a, (y, nbr, seed) in enumerate(zip(ys, nbrs, seeds)):
+        z[a, :ns[a]] = y - y.mean()
+        perms[a, :, :ns[a]] = np.random.default_rng(seed).permuted(perms[a, :, :ns[a]], axis=1)
+        rows.append(a * n_max + np.repeat(np.arange(ns[a]), k)); cols.append(a * n_max + nbr.ravel())
+    # Block-diagonal row-standardized spatial weights of all areas
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    w = sparse.csr_matrix((np.full(len(rows), 1 / k), (rows, cols)), shape=(A * n_max, A * n_max))
+
+    # Observed values first, followed by their permutations: shape (A, n_max, permutations + 1)
+    zs = np.concatenate([z[:, None], np.take_along_axis(z[:, None], perms, axis=2)], axis=1).transpose(0, 2, 1)
+    lag = (w @ zs.reshape(A * n_max, -1)).reshape(zs.shape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        Is = (zs * lag).sum(axis=1) / (z**2).sum(axis=1)[:, None]
+
+    I, sim = Is[:, 0], Is[:, 1:]
+    larger = (sim >= I[:, None]).sum(axis=1)
+    larger = np.minimum(larger, permutations - larger)
+    return I, (larger + 1.) / (permutations + 1.)
+
+# %% ../nbs/04_callbacks.ipynb 51
+def moran_i(ys:list, # Values of each area, arrays of varying lengths
+            nbrs:list, # Indices of the k nearest neighbours of each area's values, arrays of shape (n, k)
+            permutations:int=999, # Number of random permutations used to compute pseudo p-values
+            seed:int=None, # Seed of the random permutations
+            keys:list=None, # Integer keys of each area deriving its own random stream from `seed`. Default to areas' positions.
+            n_workers:int=None, # Number of processes to distribute chunks of areas on. Computed in the current process if None.
+            max_elements:int=2**23, # Maximum size of the (areas, n, permutations) array processed at once
+           ) -> tuple: # Moran's I and pseudo p-values (as `esda.moran.Moran.p_sim`) of each area
+    "Moran's I of many areas with row-standardized k-nearest neighbours spatial weights, vectorized over areas and permutations."
+    if not len(ys): return np.array([]), np.array([])
+    base = np.random.SeedSequence(seed)
+    keys = range(len(ys)) if keys is None else keys
+    seeds = [np.random.SeedSequence(base.entropy, spawn_key=(int(key),)) for key in keys]
+
+    # Group areas of similar sizes into chunks of bounded memory
+    order = np.argsort([len(y) for y in ys], kind='stable')
+    chunks, chunk = [], []
+    for i in order:
+        if chunk and (len(chunk) + 1) * (permutations + 1) * len(ys[i]) > max_elements:
+            chunks.append(chunk); chunk = []
+        chunk.append(i)
+    chunks.append(chunk)
+    args = [([ys[i] for i in c], [nbrs[i] for i in c], [seeds[i] for i in c], permutations) for c in chunks]
+
+    if n_workers:
+        with ProcessPoolExecutor(n_workers) as ex: results = list(ex.map(_moran_chunk, *zip(*args)))
+    else:
+        results = [_moran_chunk(*arg) for arg in args]
+
+    I, p_sim = np.empty(len(ys)), np.empty(len(ys))
+    idx = np.concatenate(chunks)
+    I[idx] = np.concatenate([r[0] for r in results])
+    p_sim[idx] = np.concatenate([r[1] for r in results])
+    return I, p_sim
+
+# %% ../nbs/04_callbacks.ipynb 56
 class MoranICB(Callback):
     "Compute Moran.I of measurements at given location. Return NaN if p_sim above threshold."
-    def __init__(self, k=5, p_threshold=0.05, name='Moran.I', min_n=5): fc.store_attr()
+    exec_args = ('n_workers',)
+    def __init__(self, 
+                 k=5, # Number of nearest neighbours used to expand measurements and define spatial weights
+                 p_threshold=0.05, # Moran.I is set to NaN if its pseudo p-value is above this threshold
+                 name='Moran.I', # Name of the State variable
+                 min_n=5, # Moran.I is set to NaN if an area has `min_n` measurements or less
+                 permutations=999, # Number of random permutations used to compute pseudo p-values
+                 seed=None, # Seed of the random permutations
+                 n_workers=None, # Number of processes computing chunks of areas in parallel in `batch` mode
+                ): 
+        fc.store_attr()
+
+    def _weights(self, 
+                 loc_id:int, # Unique id of an individual area of interest. 
+                 idx:np.ndarray, # Positional indices of the expanded measurements
+                 o:Type[State] # A State's object
+                ):
+        "Neighbours defining the spatial weights of the expanded measurements, cached until measurements change."
+        key = ('weights', self.k, loc_id)
+        if key not in o.derived: o.derived[key] = knn_neighbours(o.coords[idx], k=self.k)
+        return o.derived[key]
+
+    def _morans(self, loc_ids, o:Type[State], n_workers=None):
+        "Moran.I per `loc_id` thresholded on its pseudo p-value, seeded by `loc_id` position in `smp_areas`."
+        ys, nbrs = [], []
+        for loc_id in loc_ids:
+            idx = o.neighbourhood(loc_id, k=self.k)
+            ys.append(o.measurements['value'].values[idx].astype(np.float64))
+            nbrs.append(self._weights(loc_id, idx, o))
+        I, p_sim = moran_i(ys, nbrs, self.permutations, seed=self.seed, n_workers=n_workers,
+                           keys=o.smp_areas.index.get_indexer(loc_ids))
+        return np.where(p_sim < self.p_threshold, I, np.nan)
 
-    def _weights(self, measurements):
-        w = weights.KNN.from_dataframe(measurements, k=self.k)
-        w.transform = "R" # Row-standardization
-        return w
-        
     def __call__(self, 
                  loc_id:int, # Unique id of an individual area of interest. 
                  o:Type[State] # A State's object
                 ): 
         if loc_id in o.unsampled_locs: return Variable(self.name, np.nan)
-        subset = o.measurements.loc[[loc_id]]
-        if len(subset) <= self.min_n: return Variable(self.name, np.nan)
-        expanded_measurements = o.expand_to_k_nearest(subset, k=self.k)
-        moran = esda.moran.Moran(expanded_measurements['value'], self._weights(expanded_measurements))
-        return Variable(self.name, moran.I if moran.p_sim < self.p_threshold else np.nan)
+        if len(o.positions(loc_id)) <= self.min_n: return Variable(self.name, np.nan)
+        return Variable(self.name, self._morans([loc_id], o)[0])
 
-# %% ../nbs/04_callbacks.ipynb 20
+    def fingerprint(self, 
+                    loc_ids, # Unique ids of the areas of interest.
+                    o:Type[State] # A State's object
+                   ):
+        "Results depend on the expanded measurements of each area and, through the seed, on its position in `smp_areas`."
+        if self.seed is None: return [None] * len(loc_ids)
+        values, config = o.measurements['value'].values, cb_config(self)
+        keys = o.smp_areas.index.get_indexer(loc_ids)
+        return [digest(config, key, values[idx], o.coords[idx]) 
+                for key, idx in zip(keys, (o.neighbourhood(loc_id, k=self.k) for loc_id in loc_ids))]
+
+    def affected(self, 
+                 new_measurements:'gpd.GeoDataFrame', # Measurements about to be appended
+                 o:Type[State] # A State's object
+                ):
+        "`loc_id`s receiving new measurements or having a new measurement among the `k` nearest neighbours of theirs."
+        new_locs = new_measurements.index.unique()
+        if not len(o.measurements): return new_locs
+        distances, _ = o.knn(self.k, return_distance=True)
+        kth = np.nextafter(distances[:, -1], np.inf)
+        from scipy.spatial import KDTree
+        # Bounded by the largest k-th distance as `KDTree.query` only accepts a scalar bound
+        d, _ = KDTree(new_measurements.get_coordinates().values).query(o.coords, k=1, distance_upper_bound=kth.max())
+        return new_locs.union(o.measurements.index[d <= kth].unique())
+
+    def batch(self, 
+              loc_ids, # Unique ids of the areas of interest.
+              o:Type[State] # A State's object
+             ):
+        values = pd.Series(np.nan, index=loc_ids)
+        eligible = [loc_id for loc_id in loc_ids if len(o.positions(loc_id)) > self.min_n]
+        if eligible: values[eligible] = self._morans(eligible, o, n_workers=self.n_workers)
+        return Variable(self.name, values.values)
+
+# %% ../nbs/04_callbacks.ipynb 57
 class PriorCB(Callback):
-    "Emulate a prior by taking the mean of measurement over a single grid cell."
+    "Emulate a prior by taking the mean (or other statistic) of a raster over a single grid cell."
+    exec_args = ('chunk_rows',)
     def __init__(self, 
                  fname_raster:str, # Name of raster file
-                 name:str='Prior' # Name of the State variable
+                 name:str='Prior', # Name of the State variable
+                 stat:str='mean', # One of 'mean', 'sum', 'count', 'min', 'max' and 'median'
+                 chunk_rows:int=None # Number of raster rows read at once in `batch` mode. Defaults to the whole raster.
                 ): 
         fc.store_attr()
 
@@ -177,8 +647,35 @@ class PriorCB(Callback):
                  loc_id:int, # Unique id of an individual area of interest. 
                  o:Type[State] # A State's object
                 ): 
-        polygon = o.smp_areas.loc[o.smp_areas.reset_index().loc_id == loc_id].geometry
+        import rasterio
+        from rasterio.mask import mask
+        polygon = o.smp_areas.loc[[loc_id]].geometry
         with rasterio.open(self.fname_raster) as src:
-            out_image, out_transform = mask(src, polygon, crop=True)
-            mean_value = np.mean(out_image)
-        return Variable(self.name, mean_value)
+            out_image, out_transform = mask(src, polygon, crop=True, filled=False)
+        values = np.ma.masked_invalid(out_image).compressed().astype(np.float64)
+        if self.stat == 'count': return Variable(self.name, len(values))
+        if not len(values): return Variable(self.name, np.nan)
+        return Variable(self.name, getattr(np, self.stat)(values))
+
+    def fingerprint(self, 
+                    loc_ids, # Unique ids of the areas of interest.
+                    o:Type[State] # A State's object
+                   ):
+        "Results only depend on the raster file (path and modification time) and the area's polygon."
+        import shapely
+        config = (cb_config(self), os.path.abspath(self.fname_raster), os.path.getmtime(self.fname_raster))
+        return [digest(config, wkb) for wkb in shapely.to_wkb(o.smp_areas.geometry.loc[loc_ids].values)]
+
+    def affected(self, new_measurements, o): 
+        "The prior does not depend on measurements."
+        return []
+
+    def batch(self, 
+              loc_ids, # Unique ids of the areas of interest.
+              o:Type[State] # A State's object
+             ):
+        "Zonal statistics of all `smp_areas` at once, cached as the prior does not depend on measurements."
+        if self not in o.cache:
+            from trufl.utils import zonal_stats
+            o.cache[self] = zonal_stats(self.fname_raster, o.smp_areas, self.stat, chunk_rows=self.chunk_rows)[self.stat]
+        return Variable(self.name, o.cache[self].reindex(loc_ids).values)
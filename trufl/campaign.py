@@ -0,0 +1,137 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/08_campaign.ipynb.
+
+# %% auto 0
+__all__ = ['empty_measurements', 'Campaign', 'timer']
+
+# %% ../nbs/08_campaign.ipynb 3
+import os
+import pickle
+import time
+import numpy as np
+import pandas as pd
+import fastcore.all as fc
+from contextlib import contextmanager
+from fastcore.basics import patch
+from .callbacks import State
+from .optimizer import Optimizer
+from .sampler import Sampler, rank_to_sample
+
+# %% ../nbs/08_campaign.ipynb 7
+def empty_measurements(crs=None # CRS of the measurements
+                      ) -> 'gpd.GeoDataFrame': # No measurement, with `loc_id` index, `geometry` and `value` columns
+    "Measurements of a campaign not started yet."
+    import geopandas as gpd
+    return gpd.GeoDataFrame({'value': pd.Series(dtype=np.float64)}, geometry=gpd.GeoSeries(crs=crs), 
+                            index=pd.Index([], name='loc_id'))
+
+# %% ../nbs/08_campaign.ipynb 8
+class Campaign:
+    "Run rounds of ranking, budget allocation, sampling and measurement over `smp_areas`."
+    def __init__(self, 
+                 smp_areas:'gpd.GeoDataFrame', # Grid of areas/polygons of interest with `loc_id` and `geometry`
+                 collector, # Object collecting measurements at sampled locations (e.g. a `DataCollector`)
+                 cbs:list, # Callbacks of the `State`
+                 is_benefit_x:list, # Whether each State variable is a benefit (or a cost)
+                 w_vector:list=None, # Weight of each State variable, computed with `w_method` and `c_method` if None
+                 n_method:str=None, # Normalization method
+                 c_method:str=None, # Correlation method
+                 w_method:str=None, # Weighting method
+                 s_method:str='CP', # Scoring method
+                 policy:str='quantiles', # Policy of `rank_to_sample`
+                 min:int=1, # Minimum of samples per area and round
+                 max:int=None, # Maximum of samples per area and round
+                 method:str='uniform', # Sampling method of `Sampler.sample`
+                 measurements:'gpd.GeoDataFrame'=None, # Measurements available before the first round
+                 seed:int=None, # Seed of the sampling random number generator
+                 checkpoint:str=None, # Path where the campaign is saved after each round
+                 **state_kwargs # Passed to `State` (e.g. `executor`, `result_cache` or `profiler`, shared with the `Optimizer`)
+                ):
+        fc.store_attr(but='measurements,seed,state_kwargs')
+        self.state_kwargs = state_kwargs
+        if measurements is None: measurements = empty_measurements(smp_areas.crs)
+        self.state = State(measurements, smp_areas, cbs, **state_kwargs)
+        self.sampler = Sampler(smp_areas)
+        self.rng = np.random.default_rng(seed)
+        self.history = [] # One record per completed round
+
+    @property
+    def measurements(self) -> 'gpd.GeoDataFrame': return self.state.measurements
+
+# %% ../nbs/08_campaign.ipynb 10
+@contextmanager
+def timer(timings:dict, # Where to add the elapsed time
+          stage:str, # Key of the elapsed time in `timings`
+         ):
+    "Add the time elapsed in the `with` block to `timings[stage]`."
+    start = time.perf_counter()
+    try: yield
+    finally: timings[stage] = timings.get(stage, 0.) + time.perf_counter() - start
+
+# %% ../nbs/08_campaign.ipynb 11
+@patch
+def run_round(self:Campaign, 
+              budget:int, # Number of samples to collect in this round
+             ) -> dict: # Record of the round
+    "Rank areas, then allocate, sample and measure `budget` locations and update the State accordingly."
+    timings = {}
+    with timer(timings, 'state'): 
+        results = self.state() if self.state.results is None else self.state.results
+    with timer(timings, 'rank'):
+        ranks = Optimizer(results, self.state.profiler).get_rank(self.is_benefit_x, self.w_vector, n_method=self.n_method, 
+                                            c_method=self.c_method, w_method=self.w_method, 
+                                            s_method=self.s_method, as_frame=False)
+    with timer(timings, 'allocate'): 
+        n = rank_to_sample(ranks, budget, min=self.min, policy=self.policy, max=self.max)
+    with timer(timings, 'sample'): locs = self.sampler.sample(n, method=self.method, rng=self.rng)
+    with timer(timings, 'collect'): new_measurements = self.collector.collect(locs)
+    with timer(timings, 'update'): self.state.update(new_measurements)
+    record = {'round': len(self.history), 'budget': budget, 'n_measurements': len(self.measurements), 
+              'allocation': n, 'timings': timings}
+    self.history.append(record)
+    if self.checkpoint is not None: self.save(self.checkpoint)
+    return record
+
+# %% ../nbs/08_campaign.ipynb 12
+@patch
+def run(self:Campaign, 
+        budgets:list, # Budget of each round, from the first one
+       ) -> pd.DataFrame: # Summary of the rounds as returned by `Campaign.summary`
+    "Run the rounds of the budget schedule not completed yet."
+    for budget in budgets[len(self.history):]: self.run_round(budget)
+    return self.summary()
+
+# %% ../nbs/08_campaign.ipynb 13
+@patch
+def summary(self:Campaign) -> pd.DataFrame: # Budget, number of measurements and time (in seconds) per stage for each round
+    "Summary of the completed rounds."
+    return pd.DataFrame([{'budget': r['budget'], 'n_measurements': r['n_measurements'], **r['timings']} 
+                         for r in self.history], index=pd.Index([r['round'] for r in self.history], name='round'))
+
+@patch(as_prop=True)
+def allocations(self:Campaign) -> pd.DataFrame: # Number of samples per round (rows) and `loc_id` (columns)
+    return pd.DataFrame([r['allocation'] for r in self.history], columns=self.smp_areas.index,
+                        index=pd.Index([r['round'] for r in self.history], name='round'))
+
+# %% ../nbs/08_campaign.ipynb 15
+@patch
+def save(self:Campaign, 
+         path:str, # Path of the checkpoint file
+        ):
+    "Save the progress of the campaign, atomically."
+    checkpoint = {'measurements': self.measurements, 'history': self.history, 
+                  'rng': self.rng.bit_generator.state}
+    with open(f'{path}.tmp', 'wb') as f: pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f'{path}.tmp', path)
+
+@patch
+def resume(self:Campaign, 
+           path:str=None, # Path of the checkpoint file. Default to `checkpoint`.
+          ) -> Campaign:
+    "Restore the progress saved at `path`, if any."
+    path = path or self.checkpoint
+    if path is None or not os.path.exists(path): return self
+    with open(path, 'rb') as f: checkpoint = pickle.load(f)
+    self.state = State(checkpoint['measurements'], self.smp_areas, self.cbs, **self.state_kwargs)
+    self.history = checkpoint['history']
+    self.rng.bit_generator.state = checkpoint['rng']
+    return self
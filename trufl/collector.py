@@ -1,35 +1,114 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/06_collector.ipynb.
 
 # %% auto 0
-__all__ = ['DataCollector']
+__all__ = ['raster_memmap', 'DataCollector']
 
 # %% ../nbs/06_collector.ipynb 3
-import rasterio
 import fastcore.all as fc
-import geopandas as gpd
-from rasterio import transform
+import numpy as np
+from collections import OrderedDict
 
-# %% ../nbs/06_collector.ipynb 5
+# %% ../nbs/06_collector.ipynb 6
+def raster_memmap(src:'rasterio.DatasetReader', # Opened raster dataset
+                  band:int=1, # The band number to use. Defaults to 1.
+                 ) -> np.memmap: # Band as a read-only memory-mapped array or None if its layout does not allow it.
+    "Memory-map a band of an uncompressed and untiled GeoTIFF whose strips are stored contiguously."
+    from rasterio.enums import Interleaving
+    if src.driver != 'GTiff' or src.compression is not None: return None
+    block_height, block_width = src.block_shapes[band-1]
+    if block_width != src.width or (src.count > 1 and src.interleaving != Interleaving.band): return None
+    n_strips = -(-src.height // block_height)
+    offsets = [src.get_tag_item(f'BLOCK_OFFSET_0_{i}', 'TIFF', bidx=band) for i in (0, n_strips - 1)]
+    if None in offsets: return None
+    first, last = map(int, offsets)
+    dtype = np.dtype(src.dtypes[band-1])
+    if last - first != (n_strips - 1) * block_height * src.width * dtype.itemsize: return None
+    with open(src.name, 'rb') as f: byteorder = '<' if f.read(2) == b'II' else '>'
+    return np.memmap(src.name, dtype=dtype.newbyteorder(byteorder), mode='r', offset=first, shape=src.shape)
+
+# %% ../nbs/06_collector.ipynb 7
 class DataCollector:
     def __init__(self, 
                  fname_raster:str, # The path to the raster file.
                  band:int=1, # The band number to use. Defaults to 1.
+                 lazy:bool=False, # Whether to read only the raster blocks containing requested points instead of the whole band.
+                 cache_size:int=2**28, # Maximum size (in bytes) of decoded blocks kept in memory in `lazy` mode.
+                 block_shape:tuple=None, # Shape of windows read in `lazy` mode. Defaults to raster's blocks (strips grouped by 256 rows at least).
                 ):
         "Emulate data collection. Provided a set of location, return values sampled from given raster file."
+        import rasterio
         fc.store_attr()
         with rasterio.open(fname_raster) as src:
-            self.band_data = src.read(band)
+            # In lazy mode, uncompressed GeoTIFFs are memory-mapped if possible, read by blocks otherwise
+            self.band_data = raster_memmap(src, band) if lazy else src.read(band)
             self.affine = src.transform
             self.bounds = src.bounds
-    
+            self.nodata = src.nodata
+            self.shape = src.shape
+            if block_shape is None:
+                height, width = src.block_shapes[band-1]
+                # Thin strips are grouped into windows of at least 256 rows
+                self.block_shape = (height * max(1, 256 // height), width) if width == src.width else (height, width)
+        self.blocks = OrderedDict() # LRU cache of decoded blocks
+        self.cached_bytes = 0 # Total size of the cached blocks
+
+    def _block(self, src, block_row:int, block_col:int) -> np.ndarray:
+        "Decoded block at (`block_row`, `block_col`), read from `src` unless cached."
+        from rasterio.windows import Window
+        key = (block_row, block_col)
+        if key in self.blocks: 
+            self.blocks.move_to_end(key)
+            return self.blocks[key]
+        height, width = self.block_shape
+        self.blocks[key] = src.read(self.band, window=Window(block_col * width, block_row * height, width, height))
+        self.cached_bytes += self.blocks[key].nbytes
+        while self.cached_bytes > self.cache_size and len(self.blocks) > 1: 
+            self.cached_bytes -= self.blocks.popitem(last=False)[1].nbytes
+        return self.blocks[key]
+
+    def _read(self, rows:np.ndarray, cols:np.ndarray) -> np.ndarray:
+        "Values at given pixels, read by groups of points falling in the same block if the band is not loaded."
+        import rasterio
+        if self.band_data is not None: return self.band_data[rows, cols]
+        height, width = self.block_shape
+        n_block_cols = -(-self.shape[1] // width)
+        block_ids = (rows // height) * n_block_cols + cols // width
+        order = np.argsort(block_ids, kind='stable')
+        blocks, starts = np.unique(block_ids[order], return_index=True)
+        values = np.empty(len(rows), dtype=np.float64)
+        with rasterio.open(self.fname_raster) as src:
+            for block_id, idx in zip(blocks, np.split(order, starts[1:])):
+                block_row, block_col = divmod(int(block_id), n_block_cols)
+                values[idx] = self._block(src, block_row, block_col)[rows[idx] - block_row * height, cols[idx] - block_col * width]
+        return values
+
+    def sample(self,
+               xs:np.ndarray, # x coordinates of the points where to measure.
+               ys:np.ndarray, # y coordinates of the points where to measure.
+              ) -> np.ndarray: # Values at each point, NaN outside raster's extent or on nodata pixels.
+        "Read raster values at given coordinates with a single fancy-indexing read."
+        cols, rows = ~self.affine * (np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64))
+        rows, cols = np.floor(rows), np.floor(cols)
+        height, width = self.shape
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        values = np.full(len(rows), np.nan)
+        values[inside] = self._read(rows[inside].astype(int), cols[inside].astype(int))
+        if self.nodata is not None: values[values == self.nodata] = np.nan
+        return values
+
     def get_values(self, 
-                   gdf:gpd.GeoDataFrame # loc_id and Point/Multipoint geometry of samples where to measure.
-                  ):
-        coords = [(x, y) for x, y in gdf.get_coordinates().values]
-        pixel_coords = [transform.rowcol(self.affine, *pair) for pair in coords]
-        return [self.band_data[int(x), int(y)] for (x, y) in pixel_coords]
-        
+                   gdf:'gpd.GeoDataFrame' # loc_id and Point/Multipoint geometry of samples where to measure.
+                  ) -> np.ndarray: # Values of each (exploded) point, NaN outside raster's extent or on nodata pixels.
+        import shapely
+        xy = shapely.get_coordinates(gdf.geometry.values)
+        return self.sample(xy[:, 0], xy[:, 1])
+
     def collect(self, 
-                gdf:gpd.GeoDataFrame # loc_id and Point/Multipoint geometry of samples where to measure.
-               ) -> gpd.GeoDataFrame:
-        return gdf.explode(index_parts=False).assign(value=self.get_values(gdf))
+                gdf:'gpd.GeoDataFrame' # loc_id and Point/Multipoint geometry of samples where to measure.
+               ) -> 'gpd.GeoDataFrame':
+        import geopandas as gpd
+        import shapely
+        xy, idx = shapely.get_coordinates(gdf.geometry.values, return_index=True)
+        return gpd.GeoDataFrame(gdf.drop(columns=gdf.geometry.name).iloc[idx], 
+                                geometry=gpd.points_from_xy(xy[:, 0], xy[:, 1], crs=gdf.crs)
+                               ).assign(value=self.sample(xy[:, 0], xy[:, 1]))
@@ -2,9 +2,10 @@
 
 # %% auto 0
 __all__ = ['is_normalized_matrix', 'is_normalized_vector', 'check_scoring_input', 'check_weighting_input',
-           'check_normalization_input', 'abspearson', 'dcor', 'squared_dcov_matrix', 'dist_matrix', 'lin_func',
-           'squared_dcov', 'squared_dcor', 'pearson', 'correlate', 'em', 'mw', 'sd', 'vic', 'linear1', 'linear2',
-           'linear3', 'vector', 'normalize', 'critic', 'weigh', 'topsis', 'cp', 'score']
+           'check_normalization_input', 'abspearson', 'dcor', 'squared_dcov_matrix', 'dist_row_sums', 'dist_cross_sum',
+           'dist_matrix', 'lin_func', 'squared_dcov', 'squared_dcor', 'pearson', 'correlate', 'em', 'mw', 'sd', 'vic',
+           'linear1', 'linear2', 'linear3', 'vector', 'normalize', 'critic', 'weigh', 'ideal_solutions',
+           'topsis_kernel', 'cp_kernel', 'topsis', 'cp', 'score', 'multi_score', 'batch_score']
 
 # %% ../nbs/05_mcdm.ipynb 2
 import numpy as np
@@ -179,53 +180,84 @@ def dcor(z_matrix:np.array):
 # %% ../nbs/05_mcdm.ipynb 10
 def squared_dcov_matrix(z_matrix:np.array):
     " Return the matrix of squared distance covariance between the columns of the provided matrix."
-    # Initialize the distance covariance matrix
-    dcov2_matrix = np.zeros(
-        (z_matrix.shape[1], z_matrix.shape[1]),
-        dtype=np.float64,
-    )
+    n_rows, n_cols = z_matrix.shape
 
-    for j_col in range(z_matrix.shape[1]):
-        # Compute the Euclidean distance matrix of the j-th criterion
-        j_dmatrix = dist_matrix(z_matrix[:, j_col])
+    # Row sums of each criterion's Euclidean distance matrix, computed once
+    row_sums = np.stack([dist_row_sums(z_matrix[:, j_col]) for j_col in range(n_cols)], axis=1)
+    totals = row_sums.sum(axis=0)
 
-        # Compute the linear function of its Euclidean distance matrix
-        j_func = lin_func(j_dmatrix)
-
-        for l_col in range(j_col, z_matrix.shape[1]):
-            if j_col == l_col:
-                # Compute the distance variance of the j-th criterion
-                dcov2_matrix[j_col, j_col] = squared_dcov(j_func, j_func)
-            else:
-                # Compute the Euclidean distance matrix of the l-th criterion
-                l_dmatrix = dist_matrix(z_matrix[:, l_col])
+    # Initialize the distance covariance matrix
+    dcov2_matrix = np.zeros((n_cols, n_cols), dtype=np.float64)
 
-                # Compute the linear function of its Euclidean distance matrix
-                l_func = lin_func(l_dmatrix)
+    for j_col in range(n_cols):
+        for l_col in range(j_col, n_cols):
+            # Sum of the products of the two criteria distance matrices
+            cross = dist_cross_sum(z_matrix[:, j_col], z_matrix[:, l_col])
 
-                # Compute the squared distance covariance of the two criteria
-                dcov2_matrix[j_col, l_col] = squared_dcov(j_func, l_func)
-                dcov2_matrix[l_col, j_col] = dcov2_matrix[j_col, l_col]
+            # Equivalent to `squared_dcov(lin_func(j_dmatrix), lin_func(l_dmatrix))` without the n x n matrices
+            dcov2 = (cross / n_rows**2 
+                     - 2 * np.dot(row_sums[:, j_col], row_sums[:, l_col]) / n_rows**3 
+                     + totals[j_col] * totals[l_col] / n_rows**4)
+            dcov2_matrix[j_col, l_col] = dcov2_matrix[l_col, j_col] = max(dcov2, 0.0)
 
     return dcov2_matrix
 
 # %% ../nbs/05_mcdm.ipynb 11
+def dist_row_sums(z_vector:np.array):
+    "Return the row sums of the Euclidean distance matrix of the provided vector in O(n log n)."
+    # Shifting by the minimum keeps constant vectors exactly at zero
+    z_vector = np.asarray(z_vector, dtype=np.float64) - np.min(z_vector)
+    n_rows = z_vector.shape[0]
+    order = np.argsort(z_vector, kind='stable')
+    z_sorted = z_vector[order]
+
+    # In sorted order, the k-th value is greater than the k values before it and lower than the others
+    before = np.cumsum(z_sorted) - z_sorted
+    after = z_sorted.sum() - before - z_sorted
+    k = np.arange(n_rows)
+    sums = np.empty(n_rows, dtype=np.float64)
+    sums[order] = z_sorted * k - before + after - z_sorted * (n_rows - 1 - k)
+    return sums
+
+
+def dist_cross_sum(j_vector:np.array, l_vector:np.array):
+    "Return the sum of the element-wise product of the Euclidean distance matrices of two vectors in O(n log^2 n)."
+    n_rows = j_vector.shape[0]
+    order = np.argsort(j_vector, kind='stable')
+    x = np.asarray(j_vector, dtype=np.float64)[order] - np.min(j_vector)
+    y = np.asarray(l_vector, dtype=np.float64)[order] - np.min(l_vector)
+    y_rank = np.empty(n_rows, dtype=np.int64)
+    y_rank[np.argsort(y, kind='stable')] = np.arange(n_rows)
+
+    # For i after j in x order: |x_i - x_j||y_i - y_j| = (x_i - x_j)(y_i - y_j)(2[y_j <= y_i] - 1),
+    # expanded into sums over j of the weights 1, x_j, y_j and x_j * y_j
+    weights = np.stack([np.ones(n_rows), x, y, x * y], axis=1)
+    def pair_sums(sums): return x * y * sums[:, 0] - x * sums[:, 2] - y * sums[:, 1] + sums[:, 3]
+
+    # Weights sums over preceding j with y_j <= y_i, merge sort style: at each level, the
+    # right half of each block gathers the weights of the left half sorted by y rank
+    dominated = np.zeros((n_rows, 4))
+    pos = np.arange(n_rows)
+    size = 1
+    while size < n_rows:
+        block, is_right = pos // (2 * size), (pos // size) % 2 == 1
+        srt = np.argsort(block * n_rows + y_rank, kind='stable')
+        csum = np.cumsum(np.where(is_right[srt, None], 0, weights[srt]), axis=0)
+        starts = np.searchsorted(block[srt], block[srt])
+        csum -= np.where(starts[:, None] > 0, csum[np.maximum(starts - 1, 0)], 0)
+        dominated[srt[is_right[srt]]] += csum[is_right[srt]]
+        size *= 2
+
+    preceding = np.cumsum(weights, axis=0) - weights
+    return 2 * np.sum(2 * pair_sums(dominated) - pair_sums(preceding))
+
+# %% ../nbs/05_mcdm.ipynb 12
 def dist_matrix(z_vector:np.array):
     "Return the Euclidean distance matrix of the provided vector."
-    # Initialize the Euclidean distance matrix
-    dmatrix = np.zeros(
-        (z_vector.shape[0], z_vector.shape[0]),
-        dtype=np.float64,
-    )
-
-    for i_row in range(z_vector.shape[0]):
-        for k_row in range(i_row + 1, z_vector.shape[0]):
-            # The Euclidean distance of two real-valued scalars corresponds
-            # to the absolute value of their difference
-            dmatrix[i_row, k_row] = np.fabs(z_vector[i_row] - z_vector[k_row])
-            dmatrix[k_row, i_row] = dmatrix[i_row, k_row]
-
-    return dmatrix
+    # The Euclidean distance of two real-valued scalars corresponds
+    # to the absolute value of their difference
+    z_vector = np.asarray(z_vector, dtype=np.float64)
+    return np.fabs(z_vector[:, None] - z_vector[None, :])
 
 
 def lin_func(dmatrix):
@@ -253,7 +285,7 @@ def squared_dcor(jl_dcov2, j_dvar2, l_dvar2):
     """
     return jl_dcov2 / np.sqrt(j_dvar2 * l_dvar2)
 
-# %% ../nbs/05_mcdm.ipynb 12
+# %% ../nbs/05_mcdm.ipynb 16
 def pearson(z_matrix:np.array):
     "Return the Pearson correlation coefficients of the provided matrix."
     # Make sure that the provided matrix is a float64 NumPy array
@@ -262,7 +294,7 @@ def pearson(z_matrix:np.array):
     return np.corrcoef(z_matrix, rowvar=False)
 
 
-# %% ../nbs/05_mcdm.ipynb 13
+# %% ../nbs/05_mcdm.ipynb 17
 def correlate(z_matrix:np.array, c_method:str):
     "Return the selected correlation coefficients of the provided matrix."
     # Use the selected correlation method
@@ -276,7 +308,7 @@ def correlate(z_matrix:np.array, c_method:str):
         raise ValueError("Unknown correlation method ({})".format(c_method))
 
 
-# %% ../nbs/05_mcdm.ipynb 14
+# %% ../nbs/05_mcdm.ipynb 18
 def em(z_matrix: np.array):
     "Return the weight vector of the provided decision matrix using the Entropy Measure method."
     # Perform sanity checks
@@ -300,7 +332,7 @@ def em(z_matrix: np.array):
     return (1.0 - e_vector) / np.sum(1.0 - e_vector)
 
 
-# %% ../nbs/05_mcdm.ipynb 15
+# %% ../nbs/05_mcdm.ipynb 19
 def mw(z_matrix:np.array):
     "Return the weight vector of the provided decision matrix using the Mean Weights method."
     # Perform sanity checks
@@ -313,7 +345,7 @@ def mw(z_matrix:np.array):
     )
 
 
-# %% ../nbs/05_mcdm.ipynb 16
+# %% ../nbs/05_mcdm.ipynb 20
 def sd(z_matrix):
     "Return the weight vector of the provided decision matrix using the Standard Deviation method."
     # Perform sanity checks
@@ -328,7 +360,7 @@ def sd(z_matrix):
     return sd_vector / np.sum(sd_vector)
 
 
-# %% ../nbs/05_mcdm.ipynb 17
+# %% ../nbs/05_mcdm.ipynb 21
 def vic(z_matrix:np.array, c_method:str="dCor"):
     "Return the weight vector of the provided decision matrix using the Variability and Interdependencies of Criteria method."
     # Perform sanity checks
@@ -353,7 +385,7 @@ def vic(z_matrix:np.array, c_method:str="dCor"):
     return imp_vector / np.sum(imp_vector)
 
 
-# %% ../nbs/05_mcdm.ipynb 18
+# %% ../nbs/05_mcdm.ipynb 22
 def linear1(x_matrix:np.array, is_benefit_x:list):
     "Return the normalized version of the provided matrix using the Linear Normalization (1) method."
     # Perform sanity checks
@@ -386,7 +418,7 @@ def linear1(x_matrix:np.array, is_benefit_x:list):
 
     return z_matrix, is_benefit_z
 
-# %% ../nbs/05_mcdm.ipynb 19
+# %% ../nbs/05_mcdm.ipynb 23
 def linear2(x_matrix:np.array, is_benefit_x:list):
     "Return the normalized version of the provided matrix using the Linear Normalization (2) method."
     # Perform sanity checks
@@ -418,7 +450,7 @@ def linear2(x_matrix:np.array, is_benefit_x:list):
     return z_matrix, is_benefit_z
 
 
-# %% ../nbs/05_mcdm.ipynb 20
+# %% ../nbs/05_mcdm.ipynb 24
 def linear3(x_matrix:np.array, is_benefit_x:list):
     "Return the normalized version of the provided matrix using the Linear Normalization (3) method."
     # Perform sanity checks
@@ -442,7 +474,7 @@ def linear3(x_matrix:np.array, is_benefit_x:list):
     return z_matrix, is_benefit_z
 
 
-# %% ../nbs/05_mcdm.ipynb 21
+# %% ../nbs/05_mcdm.ipynb 25
 def vector(x_matrix:np.array, is_benefit_x:list):
     "Return the normalized version of the provided matrix using the Vector Normalization method."
     # Perform sanity checks
@@ -467,7 +499,7 @@ def vector(x_matrix:np.array, is_benefit_x:list):
     return z_matrix, is_benefit_z
 
 
-# %% ../nbs/05_mcdm.ipynb 22
+# %% ../nbs/05_mcdm.ipynb 26
 def normalize(x_matrix:np.array, is_benefit_x:list, n_method:str):
     "Return the normalized version of the provided matrix using the selected normalization method."
     # Use the selected normalization method
@@ -489,7 +521,7 @@ def normalize(x_matrix:np.array, is_benefit_x:list, n_method:str):
         raise ValueError("Unknown normalization method ({})".format(n_method))
 
 
-# %% ../nbs/05_mcdm.ipynb 23
+# %% ../nbs/05_mcdm.ipynb 27
 def critic(z_matrix:np.array, c_method:str="Pearson"):
     "Return the weight vector of the provided decision matrix using the Criteria Importance Through Intercriteria Correlation method."
     # Perform sanity checks
@@ -515,7 +547,7 @@ def critic(z_matrix:np.array, c_method:str="Pearson"):
     # Normalize the importance of each criterion
     return imp_vector / np.sum(imp_vector)
 
-# %% ../nbs/05_mcdm.ipynb 24
+# %% ../nbs/05_mcdm.ipynb 28
 def weigh(z_matrix:np.array, w_method:str, c_method:str=None):
     "Return the weight vector of the provided decision matrix using the selected weighting method."
     # Use the selected weighting method
@@ -533,7 +565,37 @@ def weigh(z_matrix:np.array, w_method:str, c_method:str=None):
         raise ValueError("Unknown weighting method ({})".format(w_method))
 
 
-# %% ../nbs/05_mcdm.ipynb 25
+# %% ../nbs/05_mcdm.ipynb 29
+def ideal_solutions(z_matrix:np.array, w_vector:list, is_benefit_z:list):
+    "Return the weighted normalized decision matrix with its positive and negative ideal solutions."
+    # Construct the weighted normalized decision matrix
+    t_matrix = np.multiply(z_matrix, w_vector)
+
+    # Derive the positive and negative ideal solutions
+    is_benefit_z = np.asarray(is_benefit_z, dtype=bool)
+    t_max, t_min = np.amax(t_matrix, axis=0), np.amin(t_matrix, axis=0)
+    return t_matrix, np.where(is_benefit_z, t_max, t_min), np.where(is_benefit_z, t_min, t_max)
+
+# %% ../nbs/05_mcdm.ipynb 30
+def topsis_kernel(t_matrix:np.array, pos_ideal_sol:np.array, neg_ideal_sol:np.array):
+    "Return the TOPSIS scores of a weighted normalized decision matrix given its ideal solutions."
+    pos_ideal_dist = np.linalg.norm(t_matrix - pos_ideal_sol, axis=1)
+    neg_ideal_dist = np.linalg.norm(t_matrix - neg_ideal_sol, axis=1)
+    denominator = neg_ideal_dist + pos_ideal_dist
+    if np.any(denominator == 0.0):
+        raise ValueError(
+            "The sum of the negative ideal distance and the positive "
+            + "ideal distance must not be equal to zero in order to use "
+            + "the TOPSIS method",
+        )
+    return neg_ideal_dist / denominator
+
+
+def cp_kernel(t_matrix:np.array, pos_ideal_sol:np.array, neg_ideal_sol:np.array=None):
+    "Return the Compromise Programming scores of a weighted normalized decision matrix given its ideal solutions."
+    return np.linalg.norm(t_matrix - pos_ideal_sol, axis=1)
+
+# %% ../nbs/05_mcdm.ipynb 31
 def topsis(z_matrix:np.array, w_vector:str, is_benefit_z:list):
     "Return the Technique for Order Preference by Similarity to Ideal Solution scores of the provided decision matrix with the provided weight vector."
     # Perform sanity checks
@@ -542,73 +604,20 @@ def topsis(z_matrix:np.array, w_vector:str, is_benefit_z:list):
     check_scoring_input(z_matrix, w_vector, is_benefit_z, "TOPSIS")
 
     # TOPSIS scores should always be sorted in descending order
-    desc_order = True
-
-    # Construct the weighted normalized decision matrix
-    t_matrix = np.multiply(z_matrix, w_vector)
-
-    # Derive the positive and negative ideal solutions
-    pos_ideal_sol = np.zeros(t_matrix.shape[1], dtype=np.float64)
-    neg_ideal_sol = np.zeros(t_matrix.shape[1], dtype=np.float64)
-    for j in range(t_matrix.shape[1]):
-        if is_benefit_z[j]:
-            pos_ideal_sol[j] = np.amax(t_matrix[:, j])
-            neg_ideal_sol[j] = np.amin(t_matrix[:, j])
-        else:
-            pos_ideal_sol[j] = np.amin(t_matrix[:, j])
-            neg_ideal_sol[j] = np.amax(t_matrix[:, j])
-
-    # Compute the score of each alternative
-    s_vector = np.zeros(t_matrix.shape[0], dtype=np.float64)
-    for i in range(t_matrix.shape[0]):
-        pos_ideal_dist = np.linalg.norm(pos_ideal_sol - t_matrix[i, :])
-        neg_ideal_dist = np.linalg.norm(t_matrix[i, :] - neg_ideal_sol)
-        denominator = neg_ideal_dist + pos_ideal_dist
-        if denominator == 0.0:
-            raise ValueError(
-                "The sum of the negative ideal distance and the positive "
-                + "ideal distance must not be equal to zero in order to use "
-                + "the TOPSIS method",
-            )
-        s_vector[i] = neg_ideal_dist / denominator
+    return topsis_kernel(*ideal_solutions(z_matrix, w_vector, is_benefit_z)), True
 
-    return s_vector, desc_order
-
-
-# %% ../nbs/05_mcdm.ipynb 26
+# %% ../nbs/05_mcdm.ipynb 32
 def cp(z_matrix:np.array, w_vector:list, is_benefit_z:list):
-    "Return the Technique for Order Preference by Similarity to Ideal Solution scores of the provided decision matrix with the provided weight vector."
+    "Return the Compromise Programming scores of the provided decision matrix with the provided weight vector."
     # Perform sanity checks
     z_matrix = np.array(z_matrix, dtype=np.float64)
     w_vector = np.array(w_vector, dtype=np.float64)
     check_scoring_input(z_matrix, w_vector, is_benefit_z, "CP")
 
-    # CP scores should always be sorted in descending order
-    desc_order = False
+    # CP scores should always be sorted in ascending order
+    return cp_kernel(*ideal_solutions(z_matrix, w_vector, is_benefit_z)), False
 
-    # Construct the weighted normalized decision matrix
-    t_matrix = np.multiply(z_matrix, w_vector)
-
-    # Derive the positive and negative ideal solutions
-    pos_ideal_sol = np.zeros(t_matrix.shape[1], dtype=np.float64)
-    neg_ideal_sol = np.zeros(t_matrix.shape[1], dtype=np.float64)
-    for j in range(t_matrix.shape[1]):
-        if is_benefit_z[j]:
-            pos_ideal_sol[j] = np.amax(t_matrix[:, j])
-            neg_ideal_sol[j] = np.amin(t_matrix[:, j])
-        else:
-            pos_ideal_sol[j] = np.amin(t_matrix[:, j])
-            neg_ideal_sol[j] = np.amax(t_matrix[:, j])
-
-    # Compute the score of each alternative
-    s_vector = np.zeros(t_matrix.shape[0], dtype=np.float64)
-    for i in range(t_matrix.shape[0]):
-        pos_ideal_dist = np.linalg.norm(pos_ideal_sol - t_matrix[i, :])
-        s_vector[i] = pos_ideal_dist
-
-    return s_vector, desc_order
-
-# %% ../nbs/05_mcdm.ipynb 27
+# %% ../nbs/05_mcdm.ipynb 33
 def score(z_matrix:np.array, is_benefit_z:list, w_vector:list, s_method:str):
     "Return the selected scores of the provided decision matrix with the provided weight vector."
     # Use the selected scoring method
@@ -619,3 +628,49 @@ def score(z_matrix:np.array, is_benefit_z:list, w_vector:list, s_method:str):
 
     else:
         raise ValueError("Unknown scoring method ({})".format(s_method))
+
+# %% ../nbs/05_mcdm.ipynb 34
+def multi_score(z_matrix:np.array, is_benefit_z:list, w_vector:list, s_methods:list=("TOPSIS", "CP")):
+    "Return a dict of the selected scores, sharing the weighted matrix and ideal solutions across scoring methods."
+    # Perform sanity checks
+    z_matrix = np.array(z_matrix, dtype=np.float64)
+    w_vector = np.array(w_vector, dtype=np.float64)
+    kernels = {"TOPSIS": (topsis_kernel, True), "CP": (cp_kernel, False)}
+    for s_method in s_methods:
+        if s_method.upper() not in kernels: raise ValueError("Unknown scoring method ({})".format(s_method))
+        check_scoring_input(z_matrix, w_vector, is_benefit_z, s_method)
+
+    ideals = ideal_solutions(z_matrix, w_vector, is_benefit_z)
+    return {s_method: (kernels[s_method.upper()][0](*ideals), kernels[s_method.upper()][1]) for s_method in s_methods}
+
+# %% ../nbs/05_mcdm.ipynb 37
+def batch_score(z_matrix:np.array, is_benefit_z:list, w_matrix:np.array, s_method:str):
+    "Return the (k x n) selected scores of the provided decision matrix for each of the k weight vectors (rows) of `w_matrix`."
+    # Perform sanity checks
+    z_matrix = np.array(z_matrix, dtype=np.float64)
+    w_matrix = np.atleast_2d(np.array(w_matrix, dtype=np.float64))
+    if s_method.upper() not in {"TOPSIS", "CP"}: raise ValueError("Unknown scoring method ({})".format(s_method))
+    check_scoring_input(z_matrix, w_matrix[0], is_benefit_z, s_method)
+    if np.any(w_matrix < 0.0) or not np.allclose(w_matrix.sum(axis=1), 1.0):
+        raise ValueError(
+            "The weight vectors must be normalized in order to apply "
+            + "the {} scoring method".format(s_method),
+        )
+
+    # Weights being non-negative, ideal solutions of the weighted matrix are the weighted ideals of `z_matrix`,
+    # and squared weighted distances to them for all weight vectors are a single matrix product
+    is_benefit_z = np.asarray(is_benefit_z, dtype=bool)
+    z_max, z_min = np.amax(z_matrix, axis=0), np.amin(z_matrix, axis=0)
+    w2_matrix = (w_matrix**2).T
+    pos_ideal_dist = np.sqrt(np.maximum(((z_matrix - np.where(is_benefit_z, z_max, z_min))**2 @ w2_matrix).T, 0))
+    if s_method.upper() == "CP": return pos_ideal_dist, False
+
+    neg_ideal_dist = np.sqrt(np.maximum(((z_matrix - np.where(is_benefit_z, z_min, z_max))**2 @ w2_matrix).T, 0))
+    denominator = neg_ideal_dist + pos_ideal_dist
+    if np.any(denominator == 0.0):
+        raise ValueError(
+            "The sum of the negative ideal distance and the positive "
+            + "ideal distance must not be equal to zero in order to use "
+            + "the TOPSIS method",
+        )
+    return neg_ideal_dist / denominator, True
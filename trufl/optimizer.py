@@ -1,27 +1,52 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/02_optimizer.ipynb.
 
 # %% auto 0
-__all__ = ['Optimizer']
+__all__ = ['Optimizer', 'scores_to_ranks']
 
-# %% ../nbs/02_optimizer.ipynb 2
+# %% ../nbs/02_optimizer.ipynb 3
 import numpy as np
 import pandas as pd
 from fastcore.basics import patch
-from nbdev.showdoc import *
-from .mcdm import score, normalize, weigh
+from .mcdm import score, batch_score, normalize, weigh
+from .profiling import Profiler, profile
 
-# %% ../nbs/02_optimizer.ipynb 3
+# %% ../nbs/02_optimizer.ipynb 4
 class Optimizer:
     def __init__(self,
-                 state:pd.DataFrame # a dataframe with the state of the administrative boundaries
+                 state:pd.DataFrame, # a dataframe with the state of the administrative boundaries
+                 profiler:Profiler=None # Profiler timing normalization, weighing and scoring, if any
                  ):
         "Optimize the number of points for t. Provided the number of points to sample in t based on t-1, return values number of sample points."
         self.state = state
+        self.profiler = profiler
         
         self.matrix = state.to_numpy()
         return
 
-# %% ../nbs/02_optimizer.ipynb 4
+# %% ../nbs/02_optimizer.ipynb 5
+@patch
+def normalized(self:Optimizer, 
+               is_benefit_x:list,
+               n_method:str=None
+               ) -> tuple: # Normalized matrix and whether each criterion is a benefit after normalization
+    "Normalize the criteria matrix, replacing NaN values with 0 for costs and 1 for benefits."
+    z_matrix, is_benefit_z = normalize(self.matrix, is_benefit_x, n_method)
+    fill = np.broadcast_to(np.asarray(is_benefit_z, dtype=np.float64), z_matrix.shape)
+    nans = np.isnan(z_matrix)
+    z_matrix[nans] = fill[nans]
+    return z_matrix, is_benefit_z
+
+# %% ../nbs/02_optimizer.ipynb 6
+def scores_to_ranks(s_matrix:np.ndarray, # Scores, per alternative along the last axis
+                    desc_order:bool # Whether the highest score ranks first
+                    ) -> np.ndarray: # `int32` ranks (from 1) aligned with `s_matrix`
+    "Rank scores along the last axis, ties ranked in order of appearance."
+    order = np.argsort(-s_matrix if desc_order else s_matrix, axis=-1, kind='stable')
+    ranks = np.empty(order.shape, dtype=np.int32)
+    np.put_along_axis(ranks, order, np.arange(1, order.shape[-1] + 1, dtype=np.int32), axis=-1)
+    return ranks
+
+# %% ../nbs/02_optimizer.ipynb 7
 @patch
 def get_rank(self:Optimizer, 
              is_benefit_x:list,
@@ -29,37 +54,53 @@ def get_rank(self:Optimizer,
             n_method:str=None,
             c_method:str =None, 
             w_method:str=None,
-            s_method:str=None
+            s_method:str=None,
+            as_frame:bool=True # If False, return a plain array of ranks in `state` order
             ):
     "Determines the rank of the administrative polygon based on the provided states."
-    # normailize the matrix
-    z_matrix, is_benefit_z = normalize(self.matrix, is_benefit_x, n_method)
-    
-     # replace nan values with 0 if cost and & 1 if benefit
-    for i, is_benefit in enumerate(is_benefit_z):
-        if is_benefit:
-            z_matrix[:, i][np.isnan(z_matrix[:, i])] = 1
-        else:
-            z_matrix[:, i][np.isnan(z_matrix[:, i])] = 0
+    n = len(self.matrix)
+    with profile(self.profiler, 'normalize', n): z_matrix, is_benefit_z = self.normalized(is_benefit_x, n_method)
 
     if w_vector is None:
-            # Weigh each criterion using the selected methods
-            w_vector = weigh(z_matrix, w_method, c_method)
-    else:
-        pass
+        # Weigh each criterion using the selected methods
+        with profile(self.profiler, 'weigh', n): w_vector = weigh(z_matrix, w_method, c_method)
+
+    with profile(self.profiler, 'score', n): s_vector, desc_order = score(z_matrix, is_benefit_z, w_vector, s_method)
+    with profile(self.profiler, 'rank', n): ranks = scores_to_ranks(s_vector, desc_order)
+    if not as_frame: return ranks
 
-    s_vector, desc_order = score(z_matrix, is_benefit_z, w_vector, s_method)
-    state = self.state.copy()
-    state['value'] = s_vector
-    df = state[['value']]
+    # DataFrame of ranks sorted by rank
+    order = np.argsort(ranks, kind='stable')
+    return pd.DataFrame({'rank': ranks[order]}, index=self.state.index[order])
 
-    # Get the indices of the sorted scores
-    if desc_order:
-        df_sorted = df.sort_values(by='value', ascending=False)
-    else:
-        df_sorted = df.sort_values(by='value', ascending=True)
-    
-    df_sorted['rank'] = range(1, len(df_sorted) + 1)
-    df_rank = df_sorted[['rank']]
-    
-    return df_rank
+# %% ../nbs/02_optimizer.ipynb 8
+@patch
+def get_ranks(self:Optimizer, 
+              is_benefit_x:list,
+              w_matrix:np.ndarray, # (k x m) weight vectors, one scenario per row
+              n_method:str=None,
+              s_method:str=None
+              ) -> np.ndarray: # (k x n) ranks of the administrative polygons (in `state` order) per scenario
+    "Determines the ranks of the administrative polygons under many weight vectors at once."
+    # normalize the matrix once for all scenarios
+    n = len(self.matrix)
+    with profile(self.profiler, 'normalize', n): z_matrix, is_benefit_z = self.normalized(is_benefit_x, n_method)
+    with profile(self.profiler, 'score', n * len(w_matrix)): 
+        s_matrix, desc_order = batch_score(z_matrix, is_benefit_z, w_matrix, s_method)
+    with profile(self.profiler, 'rank', n * len(w_matrix)): return scores_to_ranks(s_matrix, desc_order)
+
+# %% ../nbs/02_optimizer.ipynb 9
+@patch
+def rank_stability(self:Optimizer, 
+                   ranks:np.ndarray, # (k x n) ranks as returned by `get_ranks`
+                   baseline:np.ndarray=None # (n,) baseline ranks (in `state` order) to compare each scenario with
+                   ) -> tuple: # Ranks statistics per administrative polygon and Kendall tau per scenario (if `baseline`)
+    "Summarize how stable the ranks of the administrative polygons are across scenarios."
+    df_stats = pd.DataFrame({'mean_rank': ranks.mean(axis=0), 
+                             'std_rank': ranks.std(axis=0),
+                             'min_rank': ranks.min(axis=0), 
+                             'max_rank': ranks.max(axis=0)}, index=self.state.index)
+    df_stats['spread'] = df_stats.max_rank - df_stats.min_rank
+    if baseline is None: return df_stats, None
+    from scipy.stats import kendalltau # Imported on first use as `scipy.stats` is slow to import
+    return df_stats, np.array([kendalltau(baseline, r).statistic for r in ranks])
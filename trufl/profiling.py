@@ -0,0 +1,54 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/10_profiling.ipynb.
+
+# %% auto 0
+__all__ = ['Profiler', 'profile']
+
+# %% ../nbs/10_profiling.ipynb 3
+import time
+import pandas as pd
+from contextlib import contextmanager, nullcontext
+
+# %% ../nbs/10_profiling.ipynb 5
+class Profiler:
+    "Record call counts, cumulative time and number of items (e.g. `loc_id`s) processed per stage."
+    def __init__(self, 
+                 hooks:list=None, # Functions called with `stage`, `seconds` and `n_items` on each record
+                ):
+        self.hooks = list(hooks or [])
+        self.records = {} # [calls, seconds, n_items] per stage
+
+    def record(self, 
+               stage:str, # Name of the stage
+               seconds:float, # Time spent in this call of the stage
+               n_items:int=1, # Number of items processed by this call
+              ):
+        r = self.records.setdefault(stage, [0, 0., 0])
+        r[0] += 1; r[1] += seconds; r[2] += n_items
+        for hook in self.hooks: hook(stage, seconds, n_items)
+
+    @contextmanager
+    def __call__(self, 
+                 stage:str, # Name of the stage
+                 n_items:int=1, # Number of items processed in the `with` block
+                ):
+        "Record the time spent in the `with` block."
+        start = time.perf_counter()
+        try: yield
+        finally: self.record(stage, time.perf_counter() - start, n_items)
+
+    def report(self) -> pd.DataFrame: # Calls, time, items and time per item (in seconds) per stage
+        df = pd.DataFrame.from_dict(self.records, orient='index', columns=['calls', 'time', 'n_items'])
+        df.index.name = 'stage'
+        return df.assign(time_per_item=df.time / df.n_items).sort_values('time', ascending=False)
+
+    def reset(self): self.records = {}
+
+# %% ../nbs/10_profiling.ipynb 7
+_disabled = nullcontext()
+
+def profile(profiler:Profiler, # Profiler or None if profiling is disabled
+            stage:str, # Name of the stage
+            n_items:int=1, # Number of items processed in the `with` block
+           ):
+    "Context manager recording the time spent in the `with` block with `profiler`, if any."
+    return _disabled if profiler is None else profiler(stage, n_items)
@@ -1,14 +1,84 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/00_reader.ipynb.
 
 # %% auto 0
-__all__ = ['read_shapefile', 'read_geojson']
-
-# %% ../nbs/00_reader.ipynb 2
-def read_shapefile(shp):
-    # return geopandas
-    pass
+__all__ = ['validate_loc_ids', 'read_vector', 'read_shapefile', 'read_geojson', 'write_parquet', 'read_parquet']
 
 # %% ../nbs/00_reader.ipynb 3
-def read_geojson(shp):
-    # return geopandas
-    pass
+import json
+import importlib.util
+import pandas as pd
+import geopandas as gpd
+import pyogrio
+
+# %% ../nbs/00_reader.ipynb 6
+def validate_loc_ids(df:pd.DataFrame, # Table with a `loc_id` column or index
+                     loc_id:str='loc_id', # Name of the column (or index) of ids
+                     unique:bool=True, # Whether ids must be unique (administrative units) or not (measurements)
+                    ) -> pd.DataFrame: # `df` indexed by `loc_id`
+    "Index `df` by its `loc_id` column and check that ids are not null and, if required, unique."
+    if df.index.name != loc_id:
+        if loc_id not in df.columns: raise ValueError(f'No {loc_id} column or index.')
+        df = df.set_index(loc_id)
+    df.index.name = 'loc_id'
+    if df.index.hasnans: raise ValueError(f'{loc_id} contains null values.')
+    if unique and not df.index.is_unique:
+        duplicated = df.index[df.index.duplicated()].unique()
+        raise ValueError(f'{loc_id} contains non-unique values, e.g. {list(duplicated[:5])}.')
+    return df
+
+# %% ../nbs/00_reader.ipynb 9
+def _use_arrow() -> bool: return importlib.util.find_spec('pyarrow') is not None
+
+def read_vector(path:str, # Path of a vector file (Shapefile, GeoPackage, GeoJSON, ...)
+                columns:list=None, # Attribute columns to read besides `loc_id` and geometry. Default to all.
+                bbox:tuple=None, # Only read features intersecting (minx, miny, maxx, maxy), in the file's CRS
+                where:str=None, # SQL WHERE clause filtering features, e.g. "value > 0"
+                layer:str=None, # Layer to read. Default to the first one.
+                loc_id:str='loc_id', # Column of ids
+                unique:bool=True, # Whether ids must be unique (administrative units) or not (measurements)
+               ) -> gpd.GeoDataFrame: # Features indexed by `loc_id`
+    "Read a vector file with `pyogrio`, projecting columns and pushing filters down to the driver."
+    if columns is not None and loc_id not in columns: columns = [loc_id, *columns]
+    gdf = pyogrio.read_dataframe(path, layer=layer, columns=columns, bbox=bbox, where=where, use_arrow=_use_arrow())
+    return validate_loc_ids(gdf, loc_id, unique)
+
+def read_shapefile(shp:str, **kwargs) -> gpd.GeoDataFrame: 
+    "Read a Shapefile with `read_vector`."
+    return read_vector(shp, **kwargs)
+
+def read_geojson(path:str, **kwargs) -> gpd.GeoDataFrame: 
+    "Read a GeoJSON file with `read_vector`."
+    return read_vector(path, **kwargs)
+
+# %% ../nbs/00_reader.ipynb 12
+def write_parquet(df:pd.DataFrame, # Measurements, administrative units or State table indexed by `loc_id`
+                  path:str, # Path of the Parquet file
+                  compression:str='zstd', # Compression codec
+                 ):
+    "Write `df` to Parquet, as GeoParquet with bounding box columns if it has a geometry."
+    df = df.reset_index() if df.index.name == 'loc_id' else df
+    if isinstance(df, gpd.GeoDataFrame): 
+        df.to_parquet(path, index=False, compression=compression, write_covering_bbox=True)
+    else: 
+        df.to_parquet(path, index=False, compression=compression)
+
+# %% ../nbs/00_reader.ipynb 13
+def read_parquet(path:str, # Path of a (Geo)Parquet file
+                 columns:list=None, # Columns to read besides `loc_id` and geometry. Default to all.
+                 bbox:tuple=None, # Only read features intersecting (minx, miny, maxx, maxy). GeoParquet only.
+                 loc_id:str='loc_id', # Column of ids
+                 unique:bool=False, # Whether ids must be unique (administrative units, State tables) or not (measurements)
+                ) -> pd.DataFrame: # A GeoDataFrame for GeoParquet files, a DataFrame otherwise, indexed by `loc_id`
+    "Read a (Geo)Parquet file, projecting columns and filtering row groups by bounding box."
+    import pyarrow.parquet as pq
+    if columns is not None and loc_id not in columns: columns = [loc_id, *columns]
+    geo = (pq.read_schema(path).metadata or {}).get(b'geo')
+    if geo is None:
+        if bbox is not None: raise ValueError(f'{path} is not a GeoParquet file: cannot filter it by bounding box.')
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        geometry = json.loads(geo)['primary_column']
+        if columns is not None and geometry not in columns: columns = [*columns, geometry]
+        df = gpd.read_parquet(path, columns=columns, bbox=bbox)
+        df = df.drop(columns='bbox', errors='ignore')
+    return validate_loc_ids(df, loc_id, unique)
@@ -1,23 +1,23 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/01_sampler.ipynb.
 
 # %% auto 0
-__all__ = ['Sampler', 'rank_to_sample']
+__all__ = ['UNIT_SAMPLERS', 'SAMPLING_METHODS', 'Sampler', 'POLICIES', 'allocate', 'weighted_policy', 'quantiles_policy',
+           'softmax_policy', 'proportional_policy', 'rank_to_sample']
 
 # %% ../nbs/01_sampler.ipynb 3
-import rasterio
 import fastcore.all as fc
-import geopandas as gpd
 import pandas as pd
 import numpy as np
+import warnings
 
-# %% ../nbs/01_sampler.ipynb 5
+# %% ../nbs/01_sampler.ipynb 6
 class Sampler:
     "Sample random location in `smp_areas`."
     def __init__(self, 
-                 smp_areas:gpd.GeoDataFrame, # Geographical area to sample from.
-                ) -> gpd.GeoDataFrame: # loc_id, geometry (Point or MultiPoint).
+                 smp_areas:'gpd.GeoDataFrame', # Geographical area to sample from.
+                ) -> 'gpd.GeoDataFrame': # loc_id, geometry (Point or MultiPoint).
         fc.store_attr()
-        
+
     @property
     def loc_ids(self):
         arr = self.smp_areas.reset_index().loc_id.values
@@ -25,47 +25,164 @@ class Sampler:
             raise ValueError(f'{self.loc_id_col} column contains non-unique values.')
         else:
             return arr
-        
+
+    def sample_xy(self, 
+                  n:np.ndarray, # Number of samples per area, in `smp_areas` order
+                  method:str='uniform', # 'uniform', 'stratified', 'halton', 'sobol' or 'poisson'
+                  rng:np.random.Generator=None, # Random number generator (or seed)
+                  min_dist:float=None, # Minimum distance between points of an area for 'poisson'. Default to 0.7 * sqrt(area / n).
+                 ) -> tuple: # Coordinates of shape (n.sum(), 2) and `loc_id` of each point
+        "Sample points in all areas at once, in closed form for axis-aligned boxes and by batched rejection otherwise."
+        import shapely
+        if method not in SAMPLING_METHODS: raise ValueError(f'Method {method} not implemented.')
+        rng = np.random.default_rng(rng)
+        n = np.asarray(n, dtype=int)
+        geoms = self.smp_areas.geometry.values
+        bounds = shapely.bounds(geoms)
+        extent = (bounds[:, 2] - bounds[:, 0]) * (bounds[:, 3] - bounds[:, 1])
+        # Polygons as large as their bounding box are axis-aligned boxes (as produced by `gridder`)
+        is_box = np.isclose(shapely.area(geoms), extent, rtol=1e-9)
+        shapely.prepare(geoms)
+        with np.errstate(divide='ignore', invalid='ignore'): accept = np.where(extent > 0, shapely.area(geoms) / extent, 0)
+        if np.any((n > 0) & (accept == 0)): raise ValueError('Cannot sample points in areas with no surface.')
+        if method == 'poisson': return self._sample_poisson(n, geoms, bounds, is_box, accept, min_dist, rng)
+
+        xy = np.empty((n.sum(), 2))
+        starts = np.cumsum(n) - n
+        need = n.copy()
+        while need.sum():
+            # Candidates of each area, in bounding boxes, ordered so that any prefix is well spread
+            todo = np.flatnonzero(need)
+            n_draws = np.where(is_box[todo], need[todo], np.ceil(need[todo] / accept[todo] * 1.2 + 2)).astype(int)
+            cands = np.repeat(todo, n_draws)
+            pts = _to_bounds(UNIT_SAMPLERS[method](n_draws, rng), bounds[cands])
+            inside = is_box[cands].copy()
+            inside[~inside] = shapely.contains_xy(geoms[cands[~inside]], pts[~inside, 0], pts[~inside, 1])
+            cands, pts = cands[inside], pts[inside]
+            # Keep accepted points up to the number still needed per area
+            rank = np.arange(len(cands)) - np.searchsorted(cands, cands)
+            keep = rank < need[cands]
+            cands, pts, rank = cands[keep], pts[keep], rank[keep]
+            xy[starts[cands] + n[cands] - need[cands] + rank] = pts
+            need -= np.bincount(cands, minlength=len(need))
+        return xy, self.smp_areas.index.values[np.repeat(np.arange(len(n)), n)]
+
+    def _sample_poisson(self, n, geoms, bounds, is_box, accept, min_dist, rng,
+                        max_tries:int=300, # Consecutive candidates rejected in an area before it is completed uniformly
+                        k:int=8, # Maximum number of candidates per area and per round
+                       ):
+        "Dart throwing in all areas at once, with a background grid per area to only compare candidates with nearby points."
+        import shapely
+        with np.errstate(divide='ignore'):
+            min_dist = 0.7 * np.sqrt(shapely.area(geoms) / n) if min_dist is None else np.broadcast_to(np.asarray(min_dist, float), n.shape)
+        size, active = bounds[:, 2:] - bounds[:, :2], n > 0
+        # Cells of side `min_dist / sqrt(2)` hold at most one point; they are coarsened (with 2 slots) to at most 16 cells per point
+        cell = np.ones(len(n))
+        cell[active] = np.maximum(min_dist[active] / np.sqrt(2), np.sqrt(size[active].prod(axis=1) / (16 * n[active])))
+        slots = 2 if np.any(cell[active] > min_dist[active] / np.sqrt(2) * (1 + 1e-9)) else 1
+        shape = np.where(active[:, None], np.ceil(size / cell[:, None]), 1).clip(1).astype(int)
+        # Grids are padded with 2 empty cells on each side, so that neighbours of any cell are in its area's grid
+        width = shape[:, 0] + 4
+        offset = np.cumsum(width * (shape[:, 1] + 4)) - width * (shape[:, 1] + 4) + 2 * width + 2
+        grid_x, grid_y = np.full((2, (width * (shape[:, 1] + 4)).sum(), slots), np.nan)
+        # Cells that can hold points closer than `min_dist`: the 5x5 block around a cell, without its corners
+        dx, dy = np.mgrid[-2:3, -2:3].reshape(2, -1)
+        dx, dy = dx[np.abs(dx) + np.abs(dy) < 4], dy[np.abs(dx) + np.abs(dy) < 4]
+        starts = np.cumsum(n) - n
+        xy = np.empty((n.sum(), 2))
+        count, misses = np.zeros(len(n), dtype=int), np.zeros(len(n), dtype=int)
+        while len(todo := np.flatnonzero((count < n) & (misses < max_tries))):
+            # Areas where candidates keep being rejected draw more of them per round
+            areas = np.repeat(todo, np.minimum(misses[todo] + 1, k))
+            cand = _to_bounds(rng.random((len(areas), 2)), bounds[areas])
+            inside = is_box[areas].copy()
+            inside[~inside] = shapely.contains_xy(geoms[areas[~inside]], cand[~inside, 0], cand[~inside, 1])
+            ij = np.floor((cand - bounds[areas, :2]) / cell[areas, None]).astype(int).clip(0, shape[areas] - 1)
+            own = offset[areas] + ij[:, 1] * width[areas] + ij[:, 0]
+            nb = own[:, None] + dy * width[areas, None] + dx
+            # NaN coordinates (empty slots) do not reject candidates
+            d2 = (grid_x[nb] - cand[:, 0, None, None])**2 + (grid_y[nb] - cand[:, 1, None, None])**2
+            free = np.isnan(grid_x[own])
+            ok = inside & free.any(axis=1) & ~(d2 < min_dist[areas, None, None]**2).any(axis=(1, 2))
+            # Keep the first valid candidate of each area; candidates outside of the area are not counted as misses
+            done, first = np.unique(areas[ok], return_index=True)
+            sel = np.flatnonzero(ok)[first]
+            slot = free[sel].argmax(axis=1)
+            grid_x[own[sel], slot], grid_y[own[sel], slot] = cand[sel].T
+            xy[starts[done] + count[done]] = cand[sel]
+            count[done] += 1
+            misses += np.bincount(areas[inside], minlength=len(n))
+            misses[done] = 0
+        if np.any(count < n):
+            warnings.warn(f'{np.sum(count < n)} areas cannot fit their points `min_dist` apart and are completed uniformly.')
+            rest = np.arange(len(xy)) - np.repeat(starts, n) >= np.repeat(count, n)
+            xy[rest], _ = self.sample_xy(n - count, 'uniform', rng)
+        return xy, self.smp_areas.index.values[np.repeat(np.arange(len(n)), n)]
+
     def sample(self, 
                n:np.ndarray, # Number of samples
-               **kwargs
-              ):
-        mask = n == 0    
-        pts_gseries = self.smp_areas[~mask].sample_points(n[~mask], **kwargs)
-        gdf_pts = gpd.GeoDataFrame(geometry=pts_gseries, index=pts_gseries.index)
+               method:str='uniform', # One of `SAMPLING_METHODS` or any other `GeoSeries.sample_points` method
+               rng:np.random.Generator=None, # Random number generator (or seed)
+               **kwargs # Passed to `sample_xy` (e.g. `min_dist`) or `GeoSeries.sample_points` 
+              ) -> 'gpd.GeoDataFrame': # One Point per sample indexed by `loc_id`
+        import geopandas as gpd
+        n = np.asarray(n)
+        # `seed` is the former name of `rng` in `GeoSeries.sample_points`
+        rng = kwargs.pop('seed', rng)
+        if method not in SAMPLING_METHODS:
+            mask = n == 0    
+            pts_gseries = self.smp_areas[~mask].sample_points(n[~mask], method=method, rng=rng, **kwargs)
+            gdf_pts = gpd.GeoDataFrame(geometry=pts_gseries, index=pts_gseries.index)
+        else:
+            xy, loc_ids = self.sample_xy(n, method, rng, **kwargs)
+            gdf_pts = gpd.GeoDataFrame(geometry=gpd.points_from_xy(xy[:, 0], xy[:, 1]), index=loc_ids, 
+                                       crs=self.smp_areas.crs)
         gdf_pts.index.name = 'loc_id'
         return gdf_pts
 
-# %% ../nbs/01_sampler.ipynb 9
-def rank_to_sample(ranks:np.ndarray, # Ranks sorted by `loc_id`s
-                   budget:int, # Total data collection budget available
-                   min:int=0, # Minimum of samples to be collected per area of interest
-                  policy:str="Weighted" # policy used form mapping ranks to number of samples
-                  ) -> np.ndarray: # Number of samples per area of interest to be collected in the same order as ranks
-    "Map ranks to number of samples to be collected"
-    if policy == "Weighted":
-        weights = 1/ranks
-        normalized_weights = np.array(weights) / np.sum(weights)
-        allocation = np.round(budget * normalized_weights).astype(int)
-        return np.where(allocation < min, min, allocation)
-    
-    elif policy == "quantiles":
-        # 4. Sampling policy (based on 4 quantiles of rank)
-        n_quantile = len(ranks)/4
-        sampling_policy = [int(budget*0.5/n_quantile), int(budget*0.3/n_quantile), int(budget*0.20/n_quantile), 0]
+# %% ../nbs/01_sampler.ipynb 7
+def _to_bounds(u:np.ndarray, # Points in the unit square of shape (n, 2)
+               bounds:np.ndarray, # Bounds (minx, miny, maxx, maxy) of shape (n, 4)
+              ) -> np.ndarray: # Coordinates of shape (n, 2)
+    "Map each point of the unit square into its bounds."
+    return bounds[:, :2] + u * (bounds[:, 2:] - bounds[:, :2])
+
+def _positions(counts:np.ndarray) -> np.ndarray:
+    "Position of each point within its area, areas' points being consecutive."
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+def _uniform(counts, rng): return rng.random((counts.sum(), 2))
+
+def _stratified(counts, rng):
+    "Jittered points in distinct random cells of a sub-grid of at least `count` cells per area."
+    n_cols = np.ceil(np.sqrt(counts)).astype(int)
+    n_rows = np.ceil(counts / np.maximum(n_cols, 1)).astype(int)
+    n_cells = n_cols * n_rows
+    # Random cells without replacement: the first `count` of a random ordering of each area's cells
+    areas = np.repeat(np.arange(len(counts)), n_cells)
+    order = np.lexsort((rng.random(len(areas)), areas))
+    cells = _positions(n_cells)[order][_positions(n_cells) < np.repeat(counts, n_cells)]
+    cols, rows = np.repeat(n_cols, counts), np.repeat(n_rows, counts)
+    u = rng.random((counts.sum(), 2))
+    return np.stack([(cells % cols + u[:, 0]) / cols, (cells // cols + u[:, 1]) / rows], axis=1)
+
+def _low_discrepancy(engine:str # 'Halton' or 'Sobol'
+                    ):
+    "Shared scrambled sequence, randomly shifted (modulo 1) per area."
+    def f(counts, rng):
+        from scipy.stats import qmc # Imported on first use as `scipy.stats` is slow to import
+        if not counts.sum(): return np.empty((0, 2))
+        n_max = counts.max()
+        seq = getattr(qmc, engine)(d=2, scramble=True, seed=rng)
+        seq = seq.random_base2(int(np.ceil(np.log2(n_max)))) if engine == 'Sobol' else seq.random(n_max)
+        shifts = np.repeat(rng.random((len(counts), 2)), counts, axis=0)
+        return (seq[_positions(counts)] + shifts) % 1
+    return f
+
+UNIT_SAMPLERS = {'uniform': _uniform, 'stratified': _stratified, 
+                 'halton': _low_discrepancy('Halton'), 'sobol': _low_discrepancy('Sobol')}
+SAMPLING_METHODS = [*UNIT_SAMPLERS, 'poisson']
 
-        # Calculate quantiles thresholds
-        quantiles_thresholds = np.quantile(ranks, [0.25, 0.5, 0.75, 1.0])
-        
-        # Assign each rank to a quantile
-        quantile_indices = np.digitize(ranks, quantiles_thresholds, right=True)
-        
-        # Map each quantile to its corresponding value in sampling_policy
-        samples_per_quantile = np.array([sampling_policy[i] for i in quantile_indices])
-        
-        # Ensure minimum samples collected per area
-        samples_per_quantile = np.where(samples_per_quantile < min, min, samples_per_quantile)
-        
-        return samples_per_quantile
-    else:
-        raise ValueError(f'Policy {policy} not implemented.')
+# %% ../nbs/01_sampler.ipynb 17
+from .allocation import POLICIES, allocate, weighted_policy, quantiles_policy, softmax_policy, proportional_policy, rank_to_sample
+_all_ = ['POLICIES', 'allocate', 'weighted_policy', 'quantiles_policy', 'softmax_policy', 'proportional_policy', 'rank_to_sample']
@@ -0,0 +1,97 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/07_uncertainty.ipynb.
+
+# %% auto 0
+__all__ = ['dirichlet_weights', 'rank_counts', 'rank_acceptability']
+
+# %% ../nbs/07_uncertainty.ipynb 3
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from fastcore.basics import patch
+from .mcdm import batch_score
+from .optimizer import Optimizer
+
+# %% ../nbs/07_uncertainty.ipynb 5
+def dirichlet_weights(w_vector:list, # Nominal weight vector
+                      n_draws:int, # Number of weight vectors to draw
+                      concentration:float=100., # The higher, the closer the draws to `w_vector`
+                      rng:np.random.Generator=None, # Random number generator (or seed)
+                      ) -> np.ndarray: # (n_draws x m) weight vectors, each summing to 1
+    "Draw weight vectors from a Dirichlet distribution centered on `w_vector`."
+    w_vector = np.asarray(w_vector, dtype=np.float64)
+    rng = np.random.default_rng(rng)
+    w_matrix = np.zeros((n_draws, len(w_vector)))
+    # Criteria with a null nominal weight keep a null weight
+    pos = w_vector > 0
+    w_matrix[:, pos] = rng.dirichlet(concentration * w_vector[pos] / w_vector[pos].sum(), n_draws)
+    return w_matrix
+
+# %% ../nbs/07_uncertainty.ipynb 7
+def rank_counts(z_matrix:np.ndarray, # Normalized decision matrix (n x m)
+                is_benefit_z:list, # Whether each criterion is a benefit (or a cost)
+                w_matrix:np.ndarray, # Weight vectors (k x m)
+                s_method:str='TOPSIS', # Scoring method
+                n_buckets:int=10, # Number of rank buckets
+                ) -> np.ndarray: # (n x n_buckets) number of weight vectors ranking each alternative in each bucket
+    "Count how often each alternative falls in each rank bucket across weight vectors."
+    s_matrix, desc_order = batch_score(z_matrix, is_benefit_z, w_matrix, s_method)
+    order = np.argsort(-s_matrix if desc_order else s_matrix, axis=1, kind='stable')
+    n_alts = order.shape[1]
+    # The alternative ranked r-th (from 0) falls in bucket r * n_buckets // n
+    buckets = np.arange(n_alts) * n_buckets // n_alts
+    flat = (order * n_buckets + buckets).ravel()
+    return np.bincount(flat, minlength=n_alts * n_buckets).reshape(n_alts, n_buckets)
+
+# %% ../nbs/07_uncertainty.ipynb 8
+_shared = {}
+
+def _init_worker(z_matrix, is_benefit_z, s_method, n_buckets):
+    "Keep the decision matrix in the worker process, rather than shipping it with each chunk."
+    _shared.update(z_matrix=z_matrix, is_benefit_z=is_benefit_z, s_method=s_method, n_buckets=n_buckets)
+
+def _counts_chunk(w_matrix):
+    return rank_counts(w_matrix=w_matrix, **_shared)
+
+# %% ../nbs/07_uncertainty.ipynb 9
+def rank_acceptability(z_matrix:np.ndarray, # Normalized decision matrix (n x m)
+                       is_benefit_z:list, # Whether each criterion is a benefit (or a cost)
+                       w_vector:list, # Nominal weight vector
+                       s_method:str='TOPSIS', # Scoring method
+                       n_draws:int=1000, # Number of weight vectors drawn
+                       concentration:float=100., # Dirichlet concentration, the higher the closer to `w_vector`
+                       n_buckets:int=10, # Number of rank buckets (`n` for one bucket per rank)
+                       seed:int=None, # Seed of the weight vectors draws
+                       n_workers:int=None, # Number of processes to distribute chunks of draws on. Computed in the current process if None.
+                       max_elements:int=2**22, # Maximum size of the (draws, alternatives) scores array processed at once
+                       ) -> np.ndarray: # (n x n_buckets) probability of each alternative to fall in each rank bucket
+    "Monte Carlo rank acceptability of alternatives under weight vectors drawn around `w_vector`."
+    z_matrix = np.asarray(z_matrix, dtype=np.float64)
+    w_matrix = dirichlet_weights(w_vector, n_draws, concentration, np.random.default_rng(seed))
+    # Chunks depend on `max_elements` only, so that results do not depend on `n_workers`
+    chunk_size = max(1, max_elements // len(z_matrix))
+    chunks = [w_matrix[i:i + chunk_size] for i in range(0, n_draws, chunk_size)]
+    initargs = (z_matrix, is_benefit_z, s_method, n_buckets)
+
+    if n_workers:
+        with ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=initargs) as ex: 
+            counts = sum(ex.map(_counts_chunk, chunks))
+    else:
+        counts = sum(rank_counts(z_matrix, is_benefit_z, chunk, s_method, n_buckets) for chunk in chunks)
+    return counts / n_draws
+
+# %% ../nbs/07_uncertainty.ipynb 14
+@patch
+def get_acceptability(self:Optimizer, 
+                      is_benefit_x:list,
+                      w_vector:list, # Nominal weight vector
+                      n_method:str=None,
+                      s_method:str='TOPSIS',
+                      n_buckets:int=10, # Number of rank buckets
+                      **kwargs # Passed to `rank_acceptability`
+                      ) -> pd.DataFrame: # Probability of each administrative polygon (rows) to fall in each rank bucket (columns)
+    "Rank acceptability of the administrative polygons under uncertain criteria weights."
+    # normalize the matrix once for all draws
+    z_matrix, is_benefit_z = self.normalized(is_benefit_x, n_method)
+
+    probs = rank_acceptability(z_matrix, is_benefit_z, w_vector, s_method, n_buckets=n_buckets, **kwargs)
+    return pd.DataFrame(probs, index=self.state.index, columns=pd.RangeIndex(1, n_buckets + 1, name='bucket'))
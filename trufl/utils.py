@@ -1,23 +1,20 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/03_utils.ipynb.
 
 # %% auto 0
-__all__ = ['reproject_raster', 'gridder', 'anonymize_raster']
+__all__ = ['reproject_raster', 'gridder', 'hex_gridder', 'quadtree_gridder', 'zonal_stats', 'anonymize_raster']
 
 # %% ../nbs/03_utils.ipynb 2
 import numpy as np
-import rasterio
+import pandas as pd
 
-from rasterio.warp import calculate_default_transform, reproject, Resampling
-from rasterio.transform import from_origin
-import geopandas as gpd
-from shapely.geometry import Polygon, box
-
-# %% ../nbs/03_utils.ipynb 3
+# %% ../nbs/03_utils.ipynb 4
 def reproject_raster(src_fname:str, # Source raster geotiff file
                      dst_fname:str, # Destination raster geotiff file
                      dst_crs:str='EPSG:4326', # EPSG code to project to
                      ) -> None:
     "Reproject a GeoTiff file to specified crs"
+    import rasterio
+    from rasterio.warp import Resampling, calculate_default_transform, reproject
     with rasterio.open(src_fname) as src:
         transform, width, height = calculate_default_transform(
             src.crs, dst_crs, src.width, src.height, *src.bounds)
@@ -41,61 +38,226 @@ def reproject_raster(src_fname:str, # Source raster geotiff file
                     resampling=Resampling.nearest)
 
 
-# %% ../nbs/03_utils.ipynb 4
+# %% ../nbs/03_utils.ipynb 5
 def gridder(
     fname_raster:str, # The path to the raster file.
     band:int=1, # The band number to use. Defaults to 1.
     nrows:int=10, # The number of rows in the grid. Defaults to 10.
     ncols:int=10, # The number of columns in the grid. Defaults to 10.
-    ) -> gpd.GeoDataFrame: # A GeoDataFrame of the grid cells geometry with 'loc_id' as index.
+    ) -> 'gpd.GeoDataFrame': # A GeoDataFrame of the grid cells geometry with 'loc_id' as index.
     "Generate a grid of polygons overlaid on a raster file."
+    import geopandas as gpd
+    import shapely
+    import rasterio
     with rasterio.open(fname_raster) as f:
-        raster = f.read(band)
-        bounds = f.bounds
+        minx, miny, maxx, maxy = f.bounds
         crs = f.crs.to_string()
 
-    polygon = box(*bounds)
-    gdf_polygon = gpd.GeoDataFrame([1], geometry=[polygon], crs=crs)
+    # Cells corners, cells sharing exactly the same edges and tiling the raster bounds
+    xs, ys = np.meshgrid(np.linspace(minx, maxx, ncols + 1), np.linspace(miny, maxy, nrows + 1), indexing='ij')
 
-    # Calculate the bounds of the polygon
-    minx, miny, maxx, maxy = polygon.bounds
+    # Cells are ordered column by column (west to east), from bottom to top within a column
+    cells = shapely.box(xs[:-1, :-1].ravel(), ys[:-1, :-1].ravel(), xs[1:, 1:].ravel(), ys[1:, 1:].ravel())
+    gdf = gpd.GeoDataFrame(geometry=cells, crs=crs)
+    gdf.index.name = 'loc_id'
+    return gdf
 
-    # Calculate the width and height of each cell
-    cell_width = (maxx - minx) / ncols
-    cell_height = (maxy - miny) / nrows
+# %% ../nbs/03_utils.ipynb 10
+def hex_gridder(
+    fname_raster:str, # The path to the raster file.
+    ncols:int=10, # The number of hexagons across the raster width.
+    ) -> 'gpd.GeoDataFrame': # A GeoDataFrame of the hexagonal cells geometry with 'loc_id' as index.
+    "Generate a tessellation of pointy-top hexagons clipped to the bounds of a raster file."
+    import geopandas as gpd
+    import shapely
+    import rasterio
+    from shapely.geometry import box
+    with rasterio.open(fname_raster) as f:
+        minx, miny, maxx, maxy = f.bounds
+        crs = f.crs.to_string()
 
-    # Create an empty list to hold the grid cells
-    grid_cells = []
+    w = (maxx - minx) / ncols # Hexagon width (flat side to flat side)
+    r = w / np.sqrt(3) # Hexagon circumradius
+    nrows = int(np.ceil((maxy - miny) / (1.5 * r))) + 1
 
-    # Generate the grid
-    for i in range(ncols):
-        for j in range(nrows):
-            # Calculate the coordinates of the cell
-            x1 = minx + i * cell_width
-            y1 = miny + j * cell_height
-            x2 = x1 + cell_width
-            y2 = y1 + cell_height
+    # Centers ordered column by column, from bottom to top, odd rows shifted by half a width
+    i, j = np.meshgrid(np.arange(ncols + 1), np.arange(nrows), indexing='ij')
+    i, j = i.ravel(), j.ravel()
+    cx, cy = minx + (i + (j % 2) / 2) * w, miny + 1.5 * r * j
 
-            # Create a box for each cell
-            cell = box(x1, y1, x2, y2)
-            grid_cells.append(cell)
+    angles = np.deg2rad(30 + 60 * np.arange(7)) # Last vertex closes the ring
+    coords = np.stack([cx[:, None] + r * np.cos(angles), cy[:, None] + r * np.sin(angles)], axis=-1)
+    cells = shapely.polygons(coords)
 
-    # Create a GeoDataFrame from the grid cells
-    grid = gpd.GeoDataFrame(grid_cells, columns=['geometry'], crs=crs)
+    # Only hexagons crossing the raster bounds need clipping
+    edge = (cx - r < minx) | (cx + r > maxx) | (cy - r < miny) | (cy + r > maxy)
+    cells[edge] = shapely.intersection(cells[edge], box(minx, miny, maxx, maxy))
+    cells = cells[shapely.area(cells) > 0]
 
-    # Intersect the grid with the polygon
-    gdf = gpd.overlay(grid, gdf_polygon, how='intersection').reset_index()
-    gdf = gdf.drop(0, axis=1).set_index('index')
+    gdf = gpd.GeoDataFrame(geometry=cells, crs=crs)
     gdf.index.name = 'loc_id'
     return gdf
 
-# %% ../nbs/03_utils.ipynb 6
+# %% ../nbs/03_utils.ipynb 14
+def quadtree_gridder(
+    fname_raster:str, # The path to the raster file.
+    measurements:'gpd.GeoDataFrame'=None, # Measurements points used to refine the grid where sampling is dense.
+    max_count:int=None, # Cells with more than `max_count` measurements are split.
+    max_std:float=None, # Cells whose raster values standard deviation exceeds `max_std` are split.
+    max_depth:int=5, # Maximum number of successive splits of the initial cells.
+    band:int=1, # The band number to use. Defaults to 1.
+    nrows:int=1, # The number of rows of the initial grid. Defaults to 1.
+    ncols:int=1, # The number of columns of the initial grid. Defaults to 1.
+    ) -> 'gpd.GeoDataFrame': # A GeoDataFrame of the grid cells geometry with 'loc_id' as index.
+    "Generate an adaptive grid by splitting cells in four until measurements count and raster variability thresholds are met."
+    import geopandas as gpd
+    import shapely
+    import rasterio
+    if max_count is None and max_std is None: raise ValueError('Provide `max_count` and/or `max_std`.')
+    if max_count is not None and measurements is None: raise ValueError('`max_count` requires `measurements`.')
+    with rasterio.open(fname_raster) as f:
+        minx, miny, maxx, maxy = f.bounds
+        crs, transform = f.crs.to_string(), f.transform
+        data = f.read(band, masked=True) if max_std is not None else None
+
+    if measurements is not None:
+        if measurements.crs is not None and measurements.crs != crs: measurements = measurements.to_crs(crs)
+        px, py = shapely.get_coordinates(measurements.geometry.values).T
+        inside = (px >= minx) & (px <= maxx) & (py >= miny) & (py <= maxy)
+        px, py = (px[inside] - minx) / (maxx - minx), (py[inside] - miny) / (maxy - miny)
+    if data is not None: sats = _summed_area_tables(data)
+
+    # Cells are processed level by level, as (ix, iy) indices on the regular grid of each level
+    ix, iy = np.meshgrid(np.arange(ncols), np.arange(nrows), indexing='ij')
+    ix, iy = ix.ravel(), iy.ravel()
+    leaves = []
+    for level in range(max_depth + 1):
+        nx, ny = ncols * 2**level, nrows * 2**level
+        # Fractions of the extent are exact across levels so that neighbouring cells share edges
+        x0, x1 = minx + (maxx - minx) * (ix / nx), minx + (maxx - minx) * ((ix + 1) / nx)
+        y0, y1 = miny + (maxy - miny) * (iy / ny), miny + (maxy - miny) * ((iy + 1) / ny)
+        split = np.zeros(len(ix), dtype=bool)
+        if level < max_depth:
+            if max_count is not None: split |= _cells_count(px, py, ix, iy, nx, ny) > max_count
+            if max_std is not None: split |= _cells_std(sats, transform, x0, x1, y0, y1) > max_std
+        leaves.append(np.stack([x0, y0, x1, y1], axis=1)[~split])
+        ix = (2 * ix[split, None] + [0, 1, 0, 1]).ravel()
+        iy = (2 * iy[split, None] + [0, 0, 1, 1]).ravel()
+        if not len(ix): break
+
+    # Cells are ordered column by column (west to east), from bottom to top as in `gridder`
+    leaves = np.concatenate(leaves)
+    leaves = leaves[np.lexsort((leaves[:, 1], leaves[:, 0]))]
+    gdf = gpd.GeoDataFrame(geometry=shapely.box(*leaves.T), crs=crs)
+    gdf.index.name = 'loc_id'
+    return gdf
+
+# %% ../nbs/03_utils.ipynb 15
+def _cells_count(px, py, ix, iy, nx, ny):
+    "Number of points (as fractions of the extent) falling in cells `(ix, iy)` of a `nx` by `ny` grid."
+    if not len(px): return np.zeros(len(ix), dtype=int)
+    flat = np.minimum((px * nx).astype(int), nx - 1) * ny + np.minimum((py * ny).astype(int), ny - 1)
+    ids, counts = np.unique(flat, return_counts=True)
+    cells = ix * ny + iy
+    pos = np.minimum(np.searchsorted(ids, cells), len(ids) - 1)
+    return np.where(ids[pos] == cells, counts[pos], 0)
+
+# %% ../nbs/03_utils.ipynb 16
+def _summed_area_tables(data:np.ma.MaskedArray):
+    "Summed-area tables of valid pixels count, values and squared values (centered for numerical stability)."
+    valid = ~np.ma.getmaskarray(data) & np.isfinite(data.data)
+    values = np.where(valid, data.data, 0).astype(np.float64)
+    if valid.any(): values = np.where(valid, values - values[valid].mean(), 0)
+    sats = []
+    for a in (valid.astype(np.float64), values, values**2):
+        sat = np.zeros((a.shape[0] + 1, a.shape[1] + 1))
+        sat[1:, 1:] = a.cumsum(0).cumsum(1)
+        sats.append(sat)
+    return sats
+
+# %% ../nbs/03_utils.ipynb 17
+def _cells_std(sats, transform, x0, x1, y0, y1):
+    "Standard deviation of raster values in cells bounds, in constant time per cell from summed-area tables."
+    height, width = sats[0].shape[0] - 1, sats[0].shape[1] - 1
+    # Pixels whose centers fall in the cell (north-up raster)
+    c0 = np.clip(np.round((x0 - transform.c) / transform.a), 0, width).astype(int)
+    c1 = np.clip(np.round((x1 - transform.c) / transform.a), 0, width).astype(int)
+    r0 = np.clip(np.round((y1 - transform.f) / transform.e), 0, height).astype(int)
+    r1 = np.clip(np.round((y0 - transform.f) / transform.e), 0, height).astype(int)
+    n, s, s2 = [sat[r1, c1] - sat[r0, c1] - sat[r1, c0] + sat[r0, c0] for sat in sats]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = np.where(n > 1, s2 / n - (s / n)**2, 0)
+    return np.sqrt(np.maximum(var, 0))
+
+# %% ../nbs/03_utils.ipynb 23
+def zonal_stats(
+    fname_raster:str, # The path to the raster file.
+    zones:'gpd.GeoDataFrame', # Non-overlapping polygons over which raster values are aggregated.
+    stats:list='mean', # One or several of 'mean', 'sum', 'count', 'min', 'max' and 'median'.
+    band:int=1, # The band number to use. Defaults to 1.
+    chunk_rows:int=None, # Number of raster rows read and aggregated at once. Defaults to the whole raster.
+    ) -> pd.DataFrame: # Statistics per zone indexed as `zones` (NaN if a zone has no valid pixels).
+    "Compute statistics of raster values per zone, rasterizing the zones once and reading the raster in a single pass."
+    import rasterio
+    from rasterio.windows import Window
+    from shapely.geometry import box
+    from rasterio.features import rasterize
+    stats = [stats] if isinstance(stats, str) else list(stats)
+    unknown = set(stats) - {'mean', 'sum', 'count', 'min', 'max', 'median'}
+    if unknown: raise ValueError(f'Statistics {unknown} not implemented.')
+
+    n = len(zones)
+    count, total = np.zeros(n + 1), np.zeros(n + 1)
+    vmin, vmax = np.full(n + 1, np.inf), np.full(n + 1, -np.inf)
+    all_labels, all_values = [], []
+    with rasterio.open(fname_raster) as src:
+        if None not in (zones.crs, src.crs) and zones.crs != src.crs: zones = zones.to_crs(src.crs)
+        geoms = zones.geometry.values
+        chunk_rows = chunk_rows or src.height
+        for row_off in range(0, src.height, chunk_rows):
+            window = Window(0, row_off, src.width, min(chunk_rows, src.height - row_off))
+            # Zones are labelled 1..n, 0 being the background
+            idx = zones.sindex.query(box(*src.window_bounds(window))) if chunk_rows < src.height else np.arange(n)
+            if not len(idx): continue
+            data = src.read(band, window=window, masked=True)
+            labels = rasterize(zip(geoms[idx], idx + 1), out_shape=data.shape, 
+                               transform=src.window_transform(window), fill=0, dtype='int32')
+            valid = (labels > 0) & ~np.ma.getmaskarray(data) & np.isfinite(data.data)
+            labels, values = labels[valid], data.data[valid].astype(np.float64)
+
+            count += np.bincount(labels, minlength=n + 1)
+            total += np.bincount(labels, weights=values, minlength=n + 1)
+            if 'min' in stats: np.minimum.at(vmin, labels, values)
+            if 'max' in stats: np.maximum.at(vmax, labels, values)
+            if 'median' in stats: all_labels.append(labels); all_values.append(values)
+
+    results = {'count': count, 'sum': total, 'min': vmin, 'max': vmax}
+    with np.errstate(invalid='ignore', divide='ignore'): results['mean'] = total / count
+    if 'median' in stats: results['median'] = _zonal_median(all_labels, all_values, count)
+    return pd.DataFrame({s: np.where((count > 0) | (s == 'count'), results[s], np.nan)[1:] for s in stats}, 
+                        index=zones.index)
+
+# %% ../nbs/03_utils.ipynb 24
+def _zonal_median(labels:list, values:list, count:np.ndarray):
+    "Median of `values` per label, sorting (label, value) pairs once."
+    if not len(labels) or not count.sum(): return np.full(len(count), np.nan)
+    labels, values = np.concatenate(labels), np.concatenate(values)
+    values = values[np.lexsort((values, labels))]
+    n = count.astype(int)
+    starts = np.cumsum(n) - n
+    lo, hi = starts + np.maximum(n - 1, 0) // 2, starts + n // 2
+    lo, hi = np.minimum(lo, len(values) - 1), np.minimum(hi, len(values) - 1)
+    return np.where(n > 0, (values[lo] + values[hi]) / 2, np.nan)
+
+# %% ../nbs/03_utils.ipynb 27
 def anonymize_raster(fname_raster:str, # The path to the raster file.
                      new_lon_origin:float, # Longitude of the new origin
                      new_lat_origin:float, # Latitude of the new origin
                      band:int=1, # The band number to use. Defaults to 1.
                      ) -> None:
     "Anonymze a raster by translating it to specified location and values standardized."
+    import rasterio
+    from rasterio.transform import from_origin
     with rasterio.open(src_fname) as src:
         # Calculate the new transform based on the new origin and the same resolution
         new_transform = from_origin(new_lon_origin, new_lat_origin, src.res[0], src.res[1])